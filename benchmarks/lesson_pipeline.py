@@ -0,0 +1,32 @@
+"""Бенчмарк конвейера рендеринга уроков без manage.py.
+
+Запуск из корня репозитория::
+
+    python benchmarks/lesson_pipeline.py --lessons 10 50 200 --output bench.json
+    python benchmarks/lesson_pipeline.py --compare bench.json
+
+Принимает те же аргументы, что и ``python manage.py benchmark_lessons``:
+генерирует синтетические курсы из уроков media/49, замеряет каждый
+обработчик цепочки, get_all_lessons и страницу курса и печатает JSON.
+"""
+
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'code_io.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+
+
+def main():
+    call_command('benchmark_lessons', *sys.argv[1:])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Микробенчмарк: markdown.markdown() против пула экземпляров Markdown.
+
+Запуск из корня репозитория::
+
+    python benchmarks/markdown_engine.py [--repeat 20]
+
+Прогоняет через оба способа все уроки из media/ и короткие документы
+размером с типичную задачу, печатает время на один документ.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import timeit
+
+import markdown
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from education.markup import MARKDOWN_EXTENSIONS, code_block_cache, render_markdown  # noqa: E402
+
+
+def load_lessons():
+    lessons = []
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, 'media', '*', 'lesson_*.md'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            lessons.append(f.read())
+    return lessons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    lessons = load_lessons()
+    if not lessons:
+        sys.exit('В media/ нет уроков.')
+
+    for text in lessons:
+        assert render_markdown(text) == markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+
+    tasks = [f'Задача {i}: выведите **{i}** с помощью `print`.' for i in range(len(lessons))]
+
+    for label, docs in (('уроки media/', lessons), ('задачи', tasks)):
+        def fresh():
+            for text in docs:
+                markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+
+        def pooled():
+            for text in docs:
+                render_markdown(text)
+
+        total = len(docs) * args.repeat
+        for name, func in (('markdown.markdown', fresh), ('render_markdown', pooled)):
+            seconds = min(timeit.repeat(func, number=args.repeat, repeat=5))
+            print(f'{label:<13} {name:<18} {seconds / total * 1000:.3f} мс/документ')
+
+    print(f'Кэш блоков кода: {code_block_cache.stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,3 +11,15 @@ class LoggingMixin:
         response = super().dispatch(request, *args, **kwargs)
         logger.debug(f"{ts} ← Exit  {view_name}: status={response.status_code}")
         return response
+
+
+class AsyncLoggingMixin:
+    """LoggingMixin для представлений с async-обработчиками."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        view_name = self.__class__.__name__
+        ts = now().strftime('%Y-%m-%d %H:%M:%S')
+        logger.debug(f"{ts} → Enter {view_name}: {request.method} {request.get_full_path()}")
+        response = await super().dispatch(request, *args, **kwargs)
+        logger.debug(f"{ts} ← Exit  {view_name}: status={response.status_code}")
+        return response
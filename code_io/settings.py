@@ -93,6 +93,65 @@ DATABASES = {
 
 AUTH_USER_MODEL = 'authentication.User'
 
+# Кэш
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Отрендеренные уроки; LocMemCache вытесняет записи по LRU и у каждого
+    # процесса свой — для общего между воркерами кэша нужен Redis или memcached.
+    'lessons': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lessons',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+}
+
+LESSON_CACHE_ALIAS = 'lessons'
+LESSON_CACHE_HOT_SIZE = 256
+
+# Страница курса: 'lazy' — оглавление + подгрузка уроков, 'full' — все уроки сразу,
+# 'stream' — все уроки, но потоком (StreamingHttpResponse)
+COURSE_PAGE_MODE = 'lazy'
+
+# Списки курсов (все, избранные, мои, админские): размер страницы по умолчанию
+# и предел для ?limit=
+COURSES_PAGE_SIZE = 20
+COURSES_PAGE_SIZE_MAX = 100
+
+# Конфигурация полнотекстового поиска PostgreSQL (education.search)
+SEARCH_CONFIG = 'russian'
+
+# Параллельный рендеринг холодного курса: 0/1 — последовательно,
+# N — не больше N воркеров; 'process' или 'thread'
+LESSON_RENDER_WORKERS = 0
+LESSON_RENDER_EXECUTOR = 'process'
+
+# Статическая копия курсов для nginx (education.publish); пусто — публикация выключена
+COURSE_PUBLISH_ROOT = os.environ.get("COURSE_PUBLISH_ROOT") or None
+
+# Наблюдатель за MEDIA_ROOT (команда watch_media, отдельный процесс):
+# без inotify_simple папки опрашиваются раз в MEDIA_WATCHER_INTERVAL секунд
+MEDIA_WATCHER_INTERVAL = 2.0
+
+# Сколько уроков одного курса AsyncViewCourseView рендерит одновременно
+LESSON_ASYNC_CONCURRENCY = 8
+
+# Замеры этапов цепочки рендеринга (можно переключить на лету через /courses/stats/pipeline/);
+# сводка пишется в лог каждые LESSON_STAGE_STATS_LOG_EVERY замеров.
+# Переключатель — файл LESSON_STAGE_STATS_FLAG, общий для всех воркеров (None — MEDIA_ROOT/.stage-stats)
+LESSON_STAGE_STATS = False
+LESSON_STAGE_STATS_LOG_EVERY = 500
+LESSON_STAGE_STATS_FLAG = None
+
+# Уроки и опубликованные страницы от этого размера (байт) отдаются заранее сжатыми
+# (gzip, br при установленном brotli)
+LESSON_COMPRESS_MIN_SIZE = 1024
+
 # logging
 
 BASE_DIR = Path(__file__).resolve().parent.parent
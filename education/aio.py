@@ -0,0 +1,107 @@
+"""Асинхронный вариант конвейера рендеринга уроков для ASGI.
+
+Чтение файлов и обращения к кэшу уходят в потоки (``asyncio.to_thread``),
+компиляция урока без артефакта — в пул рендеринга (``education.parallel``)
+или, если он выключен, в пул потоков цикла событий. Уроки курса рендерятся
+одновременно, но не больше ``LESSON_ASYNC_CONCURRENCY`` за раз, так что
+один большой курс не занимает весь пул.
+"""
+
+import asyncio
+import os
+
+from django.conf import settings
+
+from education.cache import cached_lesson_chain
+from education.compiler import compile_lesson, load_artifact
+from education.layout import LESSON_RE
+from education.models import Lessons
+from education.parallel import get_executor
+
+
+def _cpu_executor():
+    """Пул для рендеринга: пул education.parallel или None (пул потоков цикла)."""
+    if getattr(settings, 'LESSON_RENDER_WORKERS', 0) >= 2:
+        return get_executor()
+    return None
+
+
+async def render_lesson_async(course_path, lesson_name, lesson=None):
+    """
+    Асинхронный аналог files.render_lesson.
+
+    Порядок поиска тот же: кэш рендеринга, артефакт компилятора и только
+    потом компиляция (compiler.compile_lesson), которая записывает артефакт.
+
+    :return: словарь с title, content, tasks (и lesson_id, если урок есть в БД)
+    :rtype: dict
+    """
+    m = LESSON_RE.match(lesson_name)
+    idx = int(m.group(1)) if m else None
+    title = lesson.title if lesson else None
+
+    lesson_path = os.path.join(course_path, lesson_name)
+    data = (lesson_path, lesson_name, course_path)
+    result = None
+    if await asyncio.to_thread(os.path.isfile, lesson_path):
+        try:
+            key = await asyncio.to_thread(cached_lesson_chain.make_key, data)
+            result = await asyncio.to_thread(cached_lesson_chain.get, key) if key else None
+            if result is None:
+                result = await asyncio.to_thread(load_artifact, *data)
+                if result is None:
+                    # Та же компиляция, что и в синхронном пути: артефакт записывается на диск.
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(_cpu_executor(), compile_lesson, *data)
+                if key:
+                    await asyncio.to_thread(cached_lesson_chain.set, key, result)
+            result = dict(result)
+        except Exception as e:
+            return {
+                'title': title or f"Урок {idx}",
+                'content': f"<p>Ошибка при загрузке: {e}</p>",
+                'tasks': [],
+            }
+    if result is None:
+        return {
+            'title': title or f"Урок {idx}",
+            'content': "<p>Урок пуст.</p>",
+            'tasks': [],
+        }
+
+    if title:
+        result['title'] = title
+        result['lesson_id'] = lesson.lesson_id
+    return result
+
+
+async def get_lessons_map_async(course):
+    """Асинхронный аналог files.get_lessons_map."""
+    return {obj.order: obj async for obj in Lessons.objects.filter(course=course)}
+
+
+async def get_all_lessons_async(course, course_path, lessons, lessons_map=None):
+    """
+    Асинхронный аналог files.get_all_lessons: уроки рендерятся одновременно.
+
+    :param course: Экземпляр Courses
+    :param str course_path: Путь к папке курса
+    :param lessons: Отсортированные имена файлов уроков
+    :param lessons_map: Уже загруженный словарь order → Lessons или None
+    :return: {'lessons': [...], 'name': название курса}
+    :rtype: dict
+    """
+    if lessons_map is None:
+        lessons_map = await get_lessons_map_async(course)
+    semaphore = asyncio.Semaphore(getattr(settings, 'LESSON_ASYNC_CONCURRENCY', 8))
+
+    async def render(lesson_name):
+        m = LESSON_RE.match(lesson_name)
+        obj = lessons_map.get(int(m.group(1))) if m else None
+        async with semaphore:
+            return await render_lesson_async(course_path, lesson_name, obj)
+
+    return {
+        'lessons': list(await asyncio.gather(*(render(name) for name in lessons))),
+        'name': course.title,
+    }
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EducationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'education'
+
+    def ready(self):
+        # Регистрирует сигналы поискового индекса и статической публикации.
+        from education import publish, search  # noqa: F401
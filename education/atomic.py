@@ -0,0 +1,78 @@
+"""Атомарная запись файлов.
+
+Файл пишется во временный файл в той же папке и подменяется через
+``os.replace``, так что читатель видит либо старое, либо новое содержимое
+целиком. Имя временного файла уникально (``tempfile``), поэтому
+одновременная запись одного пути из разных процессов и потоков не
+смешивает данные.
+
+Для чтения-изменения-записи между процессами есть ``file_lock`` —
+исключительный flock на файле-замке.
+"""
+
+import fcntl
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_file(path, mode='wb', encoding=None):
+    """
+    Файл для атомарной записи по пути path.
+
+    При выходе из блока файл подменяет path; при исключении временный файл
+    удаляется, а path остаётся прежним.
+
+    :param str path: Итоговый путь
+    :param str mode: 'wb' или 'w'
+    :param encoding: Кодировка для текстового режима
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    f = tempfile.NamedTemporaryFile(
+        mode, encoding=encoding, dir=directory,
+        prefix=f'.{os.path.basename(path)}.', suffix='.tmp', delete=False,
+    )
+    try:
+        with f:
+            yield f
+        os.replace(f.name, path)
+    except BaseException:
+        try:
+            os.remove(f.name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def atomic_write(path, data):
+    """
+    Атомарно записывает байты или строку (UTF-8) в файл.
+
+    :param str path: Итоговый путь
+    :param data: bytes или str
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    with atomic_file(path) as f:
+        f.write(data)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Исключительный flock на файле path (создаётся при необходимости).
+
+    Замок держится до выхода из блока и виден всем процессам на той же
+    файловой системе.
+
+    :param str path: Путь к файлу замка
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,333 @@
+"""Бенчмарк конвейера рендеринга уроков.
+
+Генерирует синтетические курсы из фрагментов базового корпуса
+(по умолчанию уроки ``media/49``) и замеряет:
+
+* каждый обработчик ``lesson_chain`` по отдельности;
+* ``get_all_lessons`` целиком — на холодных и на прогретых кэшах;
+* ``ViewCourseView`` через тестовый клиент во всех режимах страницы.
+
+Результат — словарь, который сохраняется в JSON и сравнивается между
+коммитами (см. ``compare_results``). Запускается командой
+``python manage.py benchmark_lessons`` или скриптом
+``benchmarks/lesson_pipeline.py``.
+"""
+
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from authentication.models import User
+from education.cache import cached_lesson_chain
+from education.chain import lesson_chain
+from education.compiler import BUILD_DIR
+from education.files import get_all_lessons, resolve_lessons
+from education.layout import list_lessons
+from education.markup import code_block_cache
+from education.models import Courses, Lessons
+
+PAGE_MODES = ('lazy', 'full', 'stream')
+CODE_BLOCK_RE = re.compile(r'^```.*?^```[ \t]*$', re.M | re.S)
+
+
+def load_corpus(corpus_path):
+    """
+    Разбирает уроки базового корпуса на текстовые абзацы и блоки кода.
+
+    :param str corpus_path: Папка курса-образца
+    :return: (абзацы, блоки кода)
+    :rtype: tuple
+    """
+    paragraphs, code_blocks = [], []
+    for lesson_name in list_lessons(corpus_path):
+        with open(os.path.join(corpus_path, lesson_name), 'r', encoding='utf-8') as f:
+            text = f.read()
+        code_blocks.extend(match.group(0) for match in CODE_BLOCK_RE.finditer(text))
+        prose = CODE_BLOCK_RE.sub('', text)
+        paragraphs.extend(part.strip() for part in prose.split('\n\n') if part.strip())
+    if not paragraphs:
+        paragraphs = ['Текст урока с **выделением** и `кодом`.']
+    if not code_blocks:
+        code_blocks = ['```python\nprint("Hello, world!")\n```']
+    return paragraphs, code_blocks
+
+
+def generate_course(course_path, corpus, lessons=10, lesson_size=4000, code_density=0.3,
+                    tasks=2, seed=0):
+    """
+    Создаёт синтетический курс.
+
+    :param str course_path: Папка, в которую пишется курс
+    :param tuple corpus: Результат load_corpus
+    :param int lessons: Число уроков
+    :param int lesson_size: Примерный размер урока в символах
+    :param float code_density: Доля фрагментов урока, которые являются блоками кода
+    :param int tasks: Число задач на урок
+    :param int seed: Зерно генератора, чтобы курсы совпадали между запусками
+    :return: имена файлов уроков
+    :rtype: list
+    """
+    paragraphs, code_blocks = corpus
+    rnd = random.Random(seed)
+    os.makedirs(os.path.join(course_path, 'tasks'), exist_ok=True)
+
+    names = []
+    for idx in range(lessons):
+        parts = [f'---\ntitle: Урок {idx}\n---\n# Урок {idx}']
+        size = 0
+        while size < lesson_size:
+            source = code_blocks if rnd.random() < code_density else paragraphs
+            part = rnd.choice(source)
+            parts.append(part)
+            size += len(part)
+        name = f'lesson_{idx}.md'
+        with open(os.path.join(course_path, name), 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(parts) + '\n')
+        for task_id in range(1, tasks + 1):
+            task_path = os.path.join(course_path, 'tasks', f'{task_id}_tusk_lesson_{idx}.md')
+            with open(task_path, 'w', encoding='utf-8') as f:
+                f.write(f'---\nright_answer: {task_id}\n---\n{rnd.choice(paragraphs)}\n')
+        names.append(name)
+    return names
+
+
+def clear_caches():
+    """Сбрасывает кэши рендеринга уроков и блоков кода."""
+    cached_lesson_chain.clear()
+    cached_lesson_chain.backend.clear()
+    code_block_cache.clear()
+
+
+def reset_caches(course_path):
+    """Сбрасывает все кэши рендеринга и артефакты курса."""
+    clear_caches()
+    shutil.rmtree(os.path.join(course_path, BUILD_DIR), ignore_errors=True)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def time_stages(course_path, lesson_names, repeat=3):
+    """
+    Замеряет каждый обработчик lesson_chain, прогоняя их вручную по цепочке.
+
+    Перед каждым повтором кэш блоков кода очищается, так что Markdown
+    замеряется без мемоизации. Берётся лучший из повторов; перед замерами
+    один урок прогоняется вхолостую, чтобы не считать импорт лексеров Pygments.
+
+    :return: имя обработчика → {'total_ms', 'per_lesson_ms'}
+    :rtype: dict
+    """
+    for lesson_name in lesson_names[:1]:
+        lesson_chain.handle((os.path.join(course_path, lesson_name), lesson_name, course_path))
+
+    best = {}
+    for _ in range(repeat):
+        code_block_cache.clear()
+        totals = {}
+        for lesson_name in lesson_names:
+            data = (os.path.join(course_path, lesson_name), lesson_name, course_path)
+            handler = lesson_chain
+            while handler is not None:
+                started = time.perf_counter()
+                data = handler.process(data)
+                name = type(handler).__name__
+                totals[name] = totals.get(name, 0.0) + time.perf_counter() - started
+                handler = handler.nxt
+        for name, seconds in totals.items():
+            best[name] = min(best.get(name, seconds), seconds)
+
+    count = max(len(lesson_names), 1)
+    return {
+        name: {'total_ms': _ms(seconds), 'per_lesson_ms': _ms(seconds / count)}
+        for name, seconds in best.items()
+    }
+
+
+def time_get_all_lessons(course, course_path, repeat=3):
+    """
+    Замеряет get_all_lessons на холодных (без кэшей и артефактов) и прогретых кэшах.
+
+    :rtype: dict
+    """
+    cold, warm = [], []
+    for _ in range(repeat):
+        reset_caches(course_path)
+        lessons = resolve_lessons(course_path)
+        started = time.perf_counter()
+        get_all_lessons(course, course_path, lessons, [])
+        cold.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        get_all_lessons(course, course_path, lessons, [])
+        warm.append(time.perf_counter() - started)
+    return {'cold_ms': _ms(min(cold)), 'warm_ms': _ms(min(warm))}
+
+
+def time_view(course, course_path, repeat=3):
+    """
+    Замеряет ViewCourseView через тестовый клиент в каждом режиме страницы.
+
+    Холодный запрос идёт после сброса кэшей, прогретый — сразу за ним.
+
+    :rtype: dict
+    """
+    client = Client()
+    url = reverse('course', args=[course.course_id])
+    results = {}
+    for mode in PAGE_MODES:
+        cold, warm = [], []
+        with override_settings(COURSE_PAGE_MODE=mode):
+            for _ in range(repeat):
+                reset_caches(course_path)
+                for timings in (cold, warm):
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    timings.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise RuntimeError(f'{url} ответил {response.status_code}')
+        results[mode] = {'cold_ms': _ms(min(cold)), 'warm_ms': _ms(min(warm))}
+    return results
+
+
+def _benchmark_course(label, author, course_path, lesson_names, repeat, params):
+    course = Courses.objects.create(title=f'Бенчмарк: {label}', author=author)
+    target = os.path.join(settings.MEDIA_ROOT, str(course.course_id))
+    shutil.move(course_path, target)
+    Lessons.objects.bulk_create(
+        Lessons(course=course, title=f'Урок {idx}', order=idx) for idx in range(len(lesson_names))
+    )
+    Courses.objects.filter(pk=course.pk).update(lessons_count=len(lesson_names))
+    size = sum(os.path.getsize(os.path.join(target, name)) for name in lesson_names)
+    return {
+        'label': label,
+        'params': params,
+        'lessons': len(lesson_names),
+        'bytes': size,
+        'stages': time_stages(target, lesson_names, repeat),
+        'get_all_lessons': time_get_all_lessons(course, target, repeat),
+        'view': time_view(course, target, repeat),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def _rollback():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def run_benchmark(sizes=(10,), lesson_size=4000, code_density=0.3, tasks=2, repeat=3,
+                  corpus_path=None, seed=0):
+    """
+    Прогоняет бенчмарк на базовом корпусе и на синтетических курсах.
+
+    Курсы создаются во временном MEDIA_ROOT, строки в БД откатываются
+    по завершении.
+
+    :param sizes: Числа уроков синтетических курсов
+    :param int lesson_size: Примерный размер урока в символах
+    :param float code_density: Доля блоков кода среди фрагментов урока
+    :param int tasks: Число задач на урок
+    :param int repeat: Число повторов каждого замера (берётся лучший)
+    :param corpus_path: Папка курса-образца; по умолчанию media/49
+    :param int seed: Зерно генератора
+    :return: результаты в виде, пригодном для JSON
+    :rtype: dict
+    """
+    corpus_path = corpus_path or os.path.join(settings.BASE_DIR, 'media', '49')
+    corpus = load_corpus(corpus_path)
+    media_root = tempfile.mkdtemp(prefix='bench-media-')
+    results = []
+    try:
+        with override_settings(MEDIA_ROOT=media_root), _rollback():
+            suffix = uuid.uuid4().hex[:8]
+            author = User.objects.create_user(
+                email=f'benchmark-{suffix}@example.com', username=f'benchmark-{suffix}', password=None
+            )
+
+            baseline = os.path.join(media_root, 'baseline')
+            shutil.copytree(corpus_path, baseline, ignore=shutil.ignore_patterns(BUILD_DIR))
+            results.append(_benchmark_course(
+                os.path.relpath(corpus_path, settings.BASE_DIR), author, baseline,
+                list_lessons(baseline), repeat, {'corpus': True}
+            ))
+
+            for lessons in sizes:
+                params = {
+                    'lessons': lessons, 'lesson_size': lesson_size,
+                    'code_density': code_density, 'tasks': tasks, 'seed': seed,
+                }
+                path = os.path.join(media_root, f'synthetic-{lessons}')
+                names = generate_course(path, corpus, lessons, lesson_size, code_density, tasks, seed)
+                results.append(_benchmark_course(f'synthetic-{lessons}', author, path, names, repeat, params))
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+        clear_caches()
+
+    return {
+        'meta': {
+            'revision': _git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def _flatten(results):
+    flat = {}
+    for result in results['results']:
+        label = result['label']
+        for stage, timing in result['stages'].items():
+            flat[f'{label}/stage/{stage}'] = timing['total_ms']
+        for phase, value in result['get_all_lessons'].items():
+            flat[f'{label}/get_all_lessons/{phase}'] = value
+        for mode, timing in result['view'].items():
+            for phase, value in timing.items():
+                flat[f'{label}/view/{mode}/{phase}'] = value
+    return flat
+
+
+def compare_results(old, new):
+    """
+    Сравнивает два прогона бенчмарка.
+
+    :return: список (метрика, старое мс, новое мс, отношение новое/старое)
+    :rtype: list
+    """
+    before, after = _flatten(old), _flatten(new)
+    rows = []
+    for name in sorted(before.keys() & after.keys()):
+        ratio = after[name] / before[name] if before[name] else None
+        rows.append((name, before[name], after[name], ratio))
+    return rows
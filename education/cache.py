@@ -0,0 +1,154 @@
+"""Кэш отрендеренных уроков.
+
+Стоит перед ``lesson_chain`` и артефактами компилятора: результат
+``BuildResultHandler`` хранится в кэше Django под ключом, построенным
+из пути, mtime и размера файла урока, отпечатка его задач и версии
+рендерера. Ключи у каждого урока свои: правка одного урока меняет
+только его ключ, закэшированный HTML остальных уроков остаётся в силе.
+
+Поверх кэша Django работает небольшой LRU-кэш внутри процесса, поэтому
+неизменившийся урок стоит только пары вызовов ``stat()``. Общим для
+процессов gunicorn кэш Django становится только с разделяемым бэкендом
+(Redis, memcached); настроенный по умолчанию ``LocMemCache`` у каждого
+процесса свой. Согласованность от этого не зависит: устаревшая запись
+не находится, потому что ключ включает отпечаток исходника.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from education.compiler import artifact_chain, source_fingerprint
+from education.instrumentation import stage_stats
+
+
+class LessonRenderCache:
+    """
+    Двухуровневый кэш вокруг цепочки рендеринга урока.
+
+    Принимает те же данные, что и ``lesson_chain.handle``:
+    data = (lesson_path, lesson_name, course_path).
+    """
+
+    def __init__(self, chain, alias=None, hot_size=None):
+        self.chain = chain
+        self.alias = alias
+        self.hot_size = hot_size
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        """Кэш Django, в котором хранятся уроки."""
+        return caches[self.alias or getattr(settings, 'LESSON_CACHE_ALIAS', 'default')]
+
+    def _hot_limit(self):
+        if self.hot_size is not None:
+            return self.hot_size
+        return getattr(settings, 'LESSON_CACHE_HOT_SIZE', 256)
+
+    @staticmethod
+    def make_key(data):
+        """
+        Строит ключ кэша для урока.
+
+        :param tuple data: (lesson_path, lesson_name, course_path)
+        :return: ключ или None, если файл урока недоступен
+        :rtype: str | None
+        """
+        lesson_path, _, course_path = data
+        fingerprint = source_fingerprint(lesson_path, course_path)
+        if fingerprint is None:
+            return None
+        return '{}{}'.format(LessonRenderCache._prefix(lesson_path), ':'.join(map(str, fingerprint)))
+
+    @staticmethod
+    def _prefix(lesson_path):
+        path_hash = hashlib.sha1(os.path.abspath(lesson_path).encode('utf-8')).hexdigest()
+        return f'lesson:{path_hash}:'
+
+    def get(self, key):
+        """Ищет урок сначала в памяти процесса, затем в кэше Django."""
+        with self._lock:
+            if key in self._hot:
+                self._hot.move_to_end(key)
+                return self._hot[key]
+        result = self.backend.get(key)
+        if result is not None:
+            self._remember(key, result)
+        return result
+
+    def set(self, key, result):
+        """Сохраняет урок в оба уровня кэша."""
+        self.backend.set(key, result)
+        self._remember(key, result)
+
+    def _remember(self, key, result):
+        limit = self._hot_limit()
+        if limit <= 0:
+            return
+        with self._lock:
+            self._hot[key] = result
+            self._hot.move_to_end(key)
+            while len(self._hot) > limit:
+                self._hot.popitem(last=False)
+
+    def discard_lesson(self, lesson_path):
+        """Выбрасывает из памяти процесса все версии урока."""
+        prefix = self._prefix(lesson_path)
+        with self._lock:
+            for key in [key for key in self._hot if key.startswith(prefix)]:
+                del self._hot[key]
+
+    def replace_lesson(self, data, result):
+        """
+        Кладёт свежий рендер урока и выбрасывает из памяти процесса его старые версии.
+
+        Вызывается после сохранения урока; записи других уроков не трогаются.
+
+        :param tuple data: (lesson_path, lesson_name, course_path)
+        :param dict result: результат BuildResultHandler
+        """
+        self.discard_lesson(data[0])
+        key = self.make_key(data)
+        if key is not None:
+            self.set(key, result)
+
+    def clear(self):
+        """Очищает кэш процесса (кэш Django не трогается)."""
+        with self._lock:
+            self._hot.clear()
+
+    def handle(self, data):
+        """
+        Возвращает отрендеренный урок, при необходимости прогоняя цепочку.
+
+        Возвращается копия словаря, так что вызывающий код может его менять.
+        """
+        key = self.make_key(data)
+        if key is None:
+            return self.chain.handle(data)
+
+        measured = stage_stats.enabled()
+        started = time.perf_counter()
+        result = self.get(key)
+        hit = result is not None
+        if not hit:
+            result = self.chain.handle(data)
+            self.set(key, result)
+        if measured:
+            stage_stats.record(
+                type(self).__name__,
+                time.perf_counter() - started,
+                cache_hits=int(hit),
+                cache_misses=int(not hit),
+            )
+        return dict(result)
+
+
+cached_lesson_chain = LessonRenderCache(artifact_chain)
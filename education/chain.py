@@ -1,18 +1,47 @@
 import os
 import re
-import markdown
+import time
+from education.instrumentation import payload_size, stage_stats
+from education.markup import code_block_cache, render_markdown
 from education.methods import get_metadata
 
 class Handler:
+    # Ключи ctx, по которым считается объём данных на входе и выходе этапа.
+    reads = ()
+    writes = ()
+
     def __init__(self, nxt=None):
         self.nxt = nxt
 
     def handle(self, data):
-        ctx = self.process(data)
+        if stage_stats.enabled():
+            ctx = self.measured_process(data)
+        else:
+            ctx = self.process(data)
         if self.nxt:
             return self.nxt.handle(ctx)
         return ctx
 
+    def measured_process(self, data):
+        """
+        Выполняет process и записывает время, объём данных и попадания в кэш блоков кода.
+        """
+        bytes_in = sum(payload_size(data.get(key)) for key in self.reads) if isinstance(data, dict) else 0
+        cache_before = code_block_cache.stats()
+        started = time.perf_counter()
+        ctx = self.process(data)
+        seconds = time.perf_counter() - started
+        cache_after = code_block_cache.stats()
+        stage_stats.record(
+            type(self).__name__,
+            seconds,
+            bytes_in=bytes_in,
+            bytes_out=sum(payload_size(ctx.get(key)) for key in self.writes),
+            cache_hits=cache_after['hits'] - cache_before['hits'],
+            cache_misses=cache_after['misses'] - cache_before['misses'],
+        )
+        return ctx
+
     def process(self, data):
         raise NotImplementedError
 
@@ -23,6 +52,8 @@ class ReadFileHandler(Handler):
     data = (lesson_path, lesson_name, course_path)
     возвращает {'raw': ..., 'lesson_name': ..., 'course_path': ...}
     """
+    writes = ('raw',)
+
     def process(self, data):
         lesson_path, lesson_name, course_path = data
         with open(lesson_path, 'r', encoding='utf-8') as f:
@@ -38,6 +69,9 @@ class MetadataHandler(Handler):
     """
     Извлекает метаданные из raw.
     """
+    reads = ('raw',)
+    writes = ('meta', 'body')
+
     def process(self, ctx):
         meta, body = get_metadata(ctx['raw'])
         ctx.update({
@@ -51,40 +85,76 @@ class MarkdownHandler(Handler):
     """
     Конвертирует оставшийся markdown в HTML.
     """
+    reads = ('body',)
+    writes = ('html',)
+
     def process(self, ctx):
-        html = markdown.markdown(
-            ctx['body'],
-            extensions=['fenced_code', 'codehilite', 'tables']
-        )
-        ctx['html'] = html
+        ctx['html'] = render_markdown(ctx['body'])
         return ctx
 
 
+TASK_RE = re.compile(r'(\d+)_tusk_lesson_(\d+)\.md')
+
+_task_indexes = {}
+
+
+def get_task_index(course_path):
+    """
+    Возвращает индекс задач курса: номер урока → [(task_id, имя файла), ...].
+
+    Индекс строится одним проходом по папке tasks и переиспользуется,
+    пока не изменится mtime папки (добавление, удаление или переименование файлов).
+    """
+    tasks_dir = os.path.join(course_path, 'tasks')
+    try:
+        mtime = os.stat(tasks_dir).st_mtime_ns
+    except OSError:
+        return {}
+
+    cached = _task_indexes.get(tasks_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    index = {}
+    for fn in os.listdir(tasks_dir):
+        m = TASK_RE.match(fn)
+        if m:
+            index.setdefault(int(m.group(2)), []).append((m.group(1), fn))
+    for tasks in index.values():
+        tasks.sort(key=lambda task: int(task[0]))
+
+    _task_indexes[tasks_dir] = (mtime, index)
+    return index
+
+
+def get_lesson_tasks(course_path, lesson_name):
+    """
+    Задачи одного урока: [(task_id, имя файла), ...], отсортированные по task_id.
+    """
+    lesson_id = int(re.search(r'(\d+)', lesson_name).group(1))
+    return get_task_index(course_path).get(lesson_id, [])
+
+
 class TaskHandler(Handler):
     """
     Находит и парсит файлы задач для данного урока.
     """
+    writes = ('tasks',)
+
     def process(self, ctx):
         course_path = ctx['course_path']
-        lesson_id = re.search(r'(\d+)', ctx['lesson_name']).group(1)
         tasks_dir = os.path.join(course_path, 'tasks')
         tasks = []
-        if os.path.isdir(tasks_dir):
-            for fn in os.listdir(tasks_dir):
-                m = re.match(r'(\d+)_tusk_lesson_(\d+)\.md', fn)
-                if m and m.group(2) == lesson_id:
-                    with open(os.path.join(tasks_dir, fn), 'r', encoding='utf-8') as f:
-                        raw_task = f.read()
-                    meta_t, body_t = get_metadata(raw_task)
-                    html_t = markdown.markdown(
-                        body_t,
-                        extensions=['fenced_code', 'codehilite', 'tables']
-                    )
-                    tasks.append({
-                        'task_id': m.group(1),
-                        'content': html_t,
-                        'right_answer': meta_t.get('right_answer', ''),
-                    })
+        for task_id, fn in get_lesson_tasks(course_path, ctx['lesson_name']):
+            with open(os.path.join(tasks_dir, fn), 'r', encoding='utf-8') as f:
+                raw_task = f.read()
+            meta_t, body_t = get_metadata(raw_task)
+            html_t = render_markdown(body_t)
+            tasks.append({
+                'task_id': task_id,
+                'content': html_t,
+                'right_answer': meta_t.get('right_answer', ''),
+            })
         ctx['tasks'] = tasks
         return ctx
 
@@ -93,6 +163,9 @@ class BuildResultHandler(Handler):
     """
     Собирает итоговую структуру урока.
     """
+    reads = ('html', 'tasks')
+    writes = ('content', 'tasks')
+
     def process(self, ctx):
         return {
             'title': ctx['meta'].get('title', f"Урок {ctx['lesson_name']}"),
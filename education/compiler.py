@@ -0,0 +1,140 @@
+"""Компиляция уроков в HTML при записи.
+
+Урок рендерится один раз — при загрузке или сохранении — и кладётся
+рядом с исходником в ``<course>/build/lesson_N.json``. Артефакт хранит
+отпечаток исходника, поэтому устаревший артефакт (например, после
+ручной правки файла) просто перекомпилируется при чтении.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+from education.atomic import atomic_file
+from education.chain import get_lesson_tasks, lesson_chain
+from education.layout import list_lessons
+
+logger = logging.getLogger('app')
+
+# Увеличивается при любом изменении HTML, который выдаёт цепочка.
+RENDERER_VERSION = 2
+
+BUILD_DIR = 'build'
+
+
+def tasks_signature(lesson_name, course_path):
+    """
+    Отпечаток задач одного урока: имена, mtime и размеры их файлов.
+
+    Задачи других уроков в отпечаток не входят, поэтому правка или
+    добавление задачи к одному уроку не сбрасывает кэш остальных.
+
+    :rtype: str
+    """
+    tasks_dir = os.path.join(course_path, 'tasks')
+    digest = hashlib.sha1()
+    for _, fn in get_lesson_tasks(course_path, lesson_name):
+        try:
+            st = os.stat(os.path.join(tasks_dir, fn))
+        except OSError:
+            continue
+        digest.update(f'{fn}:{st.st_mtime_ns}:{st.st_size}\n'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def source_fingerprint(lesson_path, course_path):
+    """
+    Возвращает отпечаток исходников урока.
+
+    :param str lesson_path: Путь к markdown-файлу урока
+    :param str course_path: Путь к папке курса
+    :return: (mtime_ns, size, tasks_signature, RENDERER_VERSION) или None, если файла нет
+    :rtype: tuple | None
+    """
+    try:
+        st = os.stat(lesson_path)
+    except OSError:
+        return None
+    tasks = tasks_signature(os.path.basename(lesson_path), course_path)
+    return st.st_mtime_ns, st.st_size, tasks, RENDERER_VERSION
+
+
+def artifact_path(course_path, lesson_name):
+    """Путь к скомпилированному уроку."""
+    name, _ = os.path.splitext(lesson_name)
+    return os.path.join(course_path, BUILD_DIR, f'{name}.json')
+
+
+def load_artifact(lesson_path, lesson_name, course_path):
+    """
+    Читает скомпилированный урок.
+
+    :return: результат BuildResultHandler или None, если артефакта нет или он устарел
+    :rtype: dict | None
+    """
+    fingerprint = source_fingerprint(lesson_path, course_path)
+    if fingerprint is None:
+        return None
+    try:
+        with open(artifact_path(course_path, lesson_name), 'r', encoding='utf-8') as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if artifact.get('fingerprint') != list(fingerprint):
+        return None
+    return artifact.get('lesson')
+
+
+def compile_lesson(lesson_path, lesson_name, course_path):
+    """
+    Рендерит урок и сохраняет артефакт рядом с исходником.
+
+    :return: результат BuildResultHandler
+    :rtype: dict
+    """
+    fingerprint = source_fingerprint(lesson_path, course_path)
+    lesson = lesson_chain.handle((lesson_path, lesson_name, course_path))
+    if fingerprint is None:
+        return lesson
+
+    with atomic_file(artifact_path(course_path, lesson_name), 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': list(fingerprint), 'lesson': lesson}, f, ensure_ascii=False)
+    return lesson
+
+
+def compile_course(course_path, force=False):
+    """
+    Компилирует все уроки курса.
+
+    :param str course_path: Путь к папке курса
+    :param bool force: Перекомпилировать даже актуальные артефакты
+    :return: количество скомпилированных уроков
+    :rtype: int
+    """
+    compiled = 0
+    for lesson_name in list_lessons(course_path):
+        lesson_path = os.path.join(course_path, lesson_name)
+        if not force and load_artifact(lesson_path, lesson_name, course_path) is not None:
+            continue
+        compile_lesson(lesson_path, lesson_name, course_path)
+        compiled += 1
+    return compiled
+
+
+class ArtifactChain:
+    """
+    Источник уроков для кэша: артефакт с диска, а при его отсутствии — компиляция.
+
+    Интерфейс совпадает с ``lesson_chain.handle``.
+    """
+
+    @staticmethod
+    def handle(data):
+        lesson = load_artifact(*data)
+        if lesson is None:
+            lesson = compile_lesson(*data)
+        return lesson
+
+
+artifact_chain = ArtifactChain()
@@ -0,0 +1,157 @@
+"""Заранее сжатые варианты отрендеренных уроков.
+
+HTML уроков с разметкой codehilite хорошо сжимается, но nginx не сжимает
+проксируемые ответы. Сжатый вариант (gzip и, если установлен пакет
+``brotli``, br) строится один раз на версию содержимого и кладётся на
+диск рядом с артефактами курса; ответ выбирает вариант по
+Accept-Encoding. Статическая копия курсов (education.publish) получает
+файлы ``.gz`` рядом с оригиналами для ``gzip_static`` nginx; ``.br`` для
+неё не пишется — в образе nginx нет модуля ``brotli_static``.
+"""
+
+import glob
+import gzip
+import hashlib
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from education.atomic import atomic_write
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSIONS = {'br': 'br', 'gzip': 'gz'}
+
+
+def available_encodings():
+    """Поддерживаемые кодировки в порядке предпочтения."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding):
+    """Сжимает байты максимальным уровнем (результат детерминирован)."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def min_size():
+    """Ответы меньше этого размера не сжимаются."""
+    return getattr(settings, 'LESSON_COMPRESS_MIN_SIZE', 1024)
+
+
+def choose_encoding(accept_encoding):
+    """
+    Выбирает кодировку по заголовку Accept-Encoding.
+
+    :param str accept_encoding: Значение заголовка
+    :return: 'br', 'gzip' или None
+    :rtype: str | None
+    """
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get('*', 0.0)
+    for encoding in available_encodings():
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def write_variants(path, data, encodings=('gzip',)):
+    """
+    Пишет рядом с файлом его сжатые варианты (path.gz и т.д.).
+
+    По умолчанию только gzip — его nginx отдаёт через gzip_static. Для
+    файлов меньше min_size() старые варианты удаляются, новые не пишутся;
+    варианты кодировок не из encodings тоже удаляются.
+
+    :param str path: Путь к несжатому файлу
+    :param bytes data: Его содержимое
+    :param encodings: Кодировки, для которых пишутся варианты
+    """
+    for encoding in ('br', 'gzip'):
+        variant = f'{path}.{EXTENSIONS[encoding]}'
+        if encoding in encodings and encoding in available_encodings() and len(data) >= min_size():
+            atomic_write(variant, compress(data, encoding))
+        elif os.path.exists(variant):
+            os.remove(variant)
+
+
+def stored_variant(directory, stem, data, encoding):
+    """
+    Сжатый вариант данных из папки, при первом обращении — сжимает и сохраняет.
+
+    Файл называется ``<stem>-<sha1>.<ext>``; при сохранении новой версии
+    старые версии того же stem удаляются.
+
+    :param str directory: Папка для сжатых вариантов
+    :param str stem: Имя ресурса (например, lesson_3.json)
+    :param bytes data: Несжатое содержимое
+    :param str encoding: 'br' или 'gzip'
+    :rtype: bytes
+    """
+    ext = EXTENSIONS[encoding]
+    digest = hashlib.sha1(data).hexdigest()[:20]
+    path = os.path.join(directory, f'{stem}-{digest}.{ext}')
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        pass
+
+    compressed = compress(data, encoding)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for stale in glob.glob(os.path.join(glob.escape(directory), f'{glob.escape(stem)}-*.{ext}')):
+            os.remove(stale)
+        atomic_write(path, compressed)
+    except OSError:
+        pass
+    return compressed
+
+
+def compressed_response(request, data, content_type, directory=None, stem=None):
+    """
+    Ответ с ETag, сжатый по Accept-Encoding.
+
+    Если переданы directory и stem, сжатый вариант берётся с диска
+    (см. stored_variant), иначе сжимается на лету. У каждого
+    представления свой ETag (хэш содержимого плюс суффикс кодировки),
+    поэтому кэши не путают сжатое тело с несжатым.
+
+    :param request: HTTP-запрос Django
+    :param bytes data: Несжатое тело ответа
+    :param str content_type: Content-Type ответа
+    :return: HttpResponse (или 304)
+    """
+    encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING')) if len(data) >= min_size() else None
+    digest = hashlib.sha1(data).hexdigest()
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if encoding is None:
+            response = HttpResponse(data, content_type=content_type)
+        else:
+            if directory and stem:
+                body = stored_variant(directory, stem, data, encoding)
+            else:
+                body = compress(data, encoding)
+            response = HttpResponse(body, content_type=content_type)
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
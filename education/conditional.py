@@ -0,0 +1,137 @@
+"""Валидаторы для условных GET-запросов (ETag).
+
+Функции передаются в ``django.views.decorators.http.condition`` и
+считаются до выполнения представления, поэтому на совпавший
+If-None-Match страница курса отвечает 304 без рендеринга уроков.
+Синхронная и асинхронная страницы курса пользуются общей парой
+``course_precondition`` / ``add_course_validators``.
+
+Last-Modified страница курса не отдаёт: она зависит и от строк БД
+(название курса, уроки, пользователь), у которых нет отметки времени,
+поэтому дата по mtime файлов дала бы 304 на устаревшую страницу.
+"""
+
+import hashlib
+import os
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from education.compiler import RENDERER_VERSION
+from education.files import get_lessons_map
+from education.manifest import get_manifest
+from education.models import Courses, CourseProgress
+from home.models import UserProfile
+
+
+def _user_bits(request):
+    """Части страницы, зависящие от пользователя: шапка и CSRF-токен."""
+    user = request.user
+    bits = [request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')]
+    if user.is_authenticated:
+        avatar = UserProfile.objects.filter(user=user).values_list('avatar', flat=True).first()
+        bits += [user.pk, user.username, user.is_staff, user.is_moderator, avatar or '']
+    else:
+        bits.append('anonymous')
+    return bits
+
+
+def course_state(request, course_id):
+    """
+    Курс и его уроки из БД, загруженные один раз на запрос.
+
+    Используется и валидаторами, и самим представлением, поэтому
+    условный GET не добавляет запросов к БД.
+
+    :return: (Courses или None, словарь order → Lessons)
+    :rtype: tuple
+    """
+    state = getattr(request, '_course_state', None)
+    if state is None:
+        course = Courses.objects.filter(course_id=course_id).first()
+        state = (course, get_lessons_map(course) if course else {})
+        request._course_state = state
+    return state
+
+
+def course_etag(request, course_id):
+    """
+    ETag страницы курса, посчитанный один раз на запрос.
+
+    Покрывает и файлы курса (хэш и ревизия манифеста), и состояние БД:
+    название курса, строки уроков, пользователя.
+
+    :return: ETag или None, если курса нет
+    :rtype: str | None
+    """
+    if hasattr(request, '_course_etag'):
+        return request._course_etag
+
+    etag = None
+    course, lessons_map = course_state(request, course_id)
+    course_path = os.path.join(settings.MEDIA_ROOT, str(course_id))
+    if course is not None and os.path.isdir(course_path):
+        manifest = get_manifest(course_path)
+        rows = sorted((obj.order, obj.title, obj.lesson_id) for obj in lessons_map.values())
+        digest = hashlib.sha1(repr((
+            manifest['hash'],
+            manifest.get('revision', 0),
+            course.title,
+            rows,
+            RENDERER_VERSION,
+            getattr(settings, 'COURSE_PAGE_MODE', 'lazy'),
+            _user_bits(request),
+        )).encode('utf-8')).hexdigest()
+        etag = f'"{digest}"'
+
+    request._course_etag = etag
+    return etag
+
+
+def course_precondition(request, course_id):
+    """
+    Проверяет If-None-Match запроса страницы курса.
+
+    :return: готовый ответ (304 или 412), если страницу рендерить не нужно, иначе None
+    """
+    etag = course_etag(request, course_id)
+    if etag is None or request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(request, etag=etag)
+
+
+def add_course_validators(request, course_id, response):
+    """
+    Добавляет к ответу страницы курса ETag и Cache-Control.
+
+    ETag уже посчитан course_precondition и берётся из запроса, поэтому
+    функция не обращается к БД и безопасна в асинхронном коде.
+
+    :return: тот же response
+    """
+    etag = course_etag(request, course_id)
+    if etag is not None and request.method in ('GET', 'HEAD'):
+        response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def progress_etag(request, course_id):
+    """
+    ETag прогресса пользователя по курсу.
+
+    Строится по самому списку пройденных уроков: счётчики строк не меняются,
+    когда один урок отмечен пройденным, а другой — нет.
+    """
+    done = CourseProgress.objects.filter(
+        user=request.user,
+        lesson__course_id=course_id,
+        status=True,
+    ).order_by('lesson_id').values_list('lesson_id', flat=True)
+    digest = hashlib.sha1(','.join(map(str, done)).encode('ascii')).hexdigest()
+    return '"progress-{}-{}"'.format(request.user.pk, digest)
+
+
+def topics_etag(topics):
+    """ETag списка тем по уже загруженным строкам."""
+    return '"{}"'.format(hashlib.sha1(repr(topics).encode('utf-8')).hexdigest())
@@ -1,59 +1,189 @@
 import os
-from .chain import lesson_chain
-import re
+
+from django.conf import settings
+
+from .cache import cached_lesson_chain
+from .layout import LESSON_RE
+from .manifest import get_manifest
+from .parallel import prerender_lessons
+from education.methods import read_metadata
 from education.models import Lessons
 
-def get_all_lessons(course, course_path, lessons, lessons_content):
+
+def render_lesson(course_path, lesson_name, lesson=None):
+    """
+    Рендерит один урок курса.
+
+    Урок берётся из кэша рендеринга, при промахе — из артефакта
+    компилятора и только потом из цепочки.
+
+    :param str course_path: Путь к папке курса
+    :param str lesson_name: Имя файла урока (lesson_N.md)
+    :param lesson: Строка Lessons для этого урока или None
+    :return: словарь с title, content, tasks (и lesson_id, если урок есть в БД)
+    :rtype: dict
+    """
+    m = LESSON_RE.match(lesson_name)
+    idx = int(m.group(1)) if m else None
+    title = lesson.title if lesson else None
+
+    lesson_path = os.path.join(course_path, lesson_name)
+    data = None
+    if os.path.isfile(lesson_path):
+        try:
+            data = cached_lesson_chain.handle((lesson_path, lesson_name, course_path))
+        except Exception as e:
+            return {
+                'title': title or f"Урок {idx}",
+                'content': f"<p>Ошибка при загрузке: {e}</p>",
+                'tasks': [],
+            }
+    if data is None:
+        return {
+            'title': title or f"Урок {idx}",
+            'content': "<p>Урок пуст.</p>",
+            'tasks': [],
+        }
+
+    if title:
+        data['title'] = title
+        data['lesson_id'] = lesson.lesson_id
+    return data
+
+
+def lesson_payload(lesson, order):
+    """
+    Урок в виде, который отдаёт LessonView: без правильных ответов к задачам.
+
+    :param dict lesson: Результат render_lesson
+    :param int order: Порядковый номер урока
+    :rtype: dict
+    """
+    return {
+        'order': order,
+        'lesson_id': lesson.get('lesson_id'),
+        'title': lesson['title'],
+        'content': lesson['content'],
+        'tasks': [
+            {'task_id': t['task_id'], 'content': t['content']}
+            for t in lesson['tasks']
+        ],
+    }
+
+
+def get_all_lessons(course, course_path, lessons, lessons_content, lessons_map=None):
     """
     course_path — абсолютный путь к папке с MD-файлами (директория курса)
     lessons — список имён файлов (.md), уже отсортированных
     lessons_content — пустой список, в который будем добавлять результаты
+    lessons_map — уже загруженный get_lessons_map(course) или None
+    """
+    prerender_lessons(course_path, lessons)
+    lessons_content.extend(iter_lessons(course, course_path, lessons, lessons_map))
+
+    return {
+        'lessons': lessons_content,
+        'name': course.title,
+    }
+
+
+def iter_lessons(course, course_path, lessons, lessons_map=None):
     """
+    Рендерит уроки по одному, по мере запроса.
+
+    :param course: Экземпляр Courses
+    :param str course_path: Путь к папке курса
+    :param lessons: Отсортированные имена файлов уроков
+    :param lessons_map: Уже загруженный get_lessons_map(course) или None
+    :return: генератор словарей, как у render_lesson
+    """
+    if lessons_map is None:
+        lessons_map = get_lessons_map(course)
+    for lesson_name in lessons:
+        m = LESSON_RE.match(lesson_name)
+        obj = lessons_map.get(int(m.group(1))) if m else None
+        yield render_lesson(course_path, lesson_name, obj)
+
+
+def get_lessons_map(course):
+    """
+    Загружает все уроки курса одним запросом.
+
+    :param course: Экземпляр Courses
+    :return: словарь order → Lessons
+    :rtype: dict
+    """
+    return {obj.order: obj for obj in Lessons.objects.filter(course=course)}
+
+
+def get_course_outline(course, lessons, course_path=None, lessons_map=None):
+    """
+    Оглавление курса без рендеринга уроков.
+
+    Для уроков без строки в БД заголовок берётся из метаданных файла,
+    если передан course_path.
+
+    :param course: Экземпляр Courses
+    :param lessons: Отсортированные имена файлов уроков
+    :param course_path: Путь к папке курса
+    :param lessons_map: Уже загруженный get_lessons_map(course) или None
+    :return: список словарей с order, title и lesson_id
+    :rtype: list
+    """
+    if lessons_map is None:
+        lessons_map = get_lessons_map(course)
+    outline = []
     for lesson_name in lessons:
-        m = re.match(r'lesson_(\d+)\.md', lesson_name)
-        idx = int(m.group(1)) if m else None
-
-        title = None
-        lesson_id = None
-        if idx is not None:
-            try:
-                obj = Lessons.objects.get(course=course, order=idx)
-                title = obj.title
-                lesson_id = obj.lesson_id
-            except Lessons.DoesNotExist:
-                title = None
-
-        lesson_path = os.path.join(course_path, lesson_name)
-        if os.path.isfile(lesson_path):
-            try:
-                data = lesson_chain.handle((lesson_path, lesson_name, course_path))
-                if title:
-                    data['title'] = title
-                    data['lesson_id'] = lesson_id
-                lessons_content.append(data)
-            except Exception as e:
-                lessons_content.append({
-                    'title': title or f"Урок {idx}",
-                    'content': f"<p>Ошибка при загрузке: {e}</p>",
-                    'tasks': [],
-                })
+        idx = int(LESSON_RE.match(lesson_name).group(1))
+        obj = lessons_map.get(idx)
+        if obj:
+            title = obj.title
+        elif course_path:
+            title = read_metadata(os.path.join(course_path, lesson_name)).get('title', f"Урок {idx}")
         else:
-            lessons_content.append({
-                'title': title or f"Урок {idx}",
-                'content': "<p>Урок пуст.</p>",
-                'tasks': [],
-            })
+            title = f"Урок {idx}"
+        outline.append({
+            'order': idx,
+            'title': title,
+            'lesson_id': obj.lesson_id if obj else None,
+        })
+    return outline
 
-    tasks_path = os.path.join(course_path, 'tasks')
-    if os.path.exists(tasks_path) and lessons_content:
-        lessons_content.pop()
 
-    return {
-        'lessons': lessons_content,
+def course_page_mode():
+    """Режим страницы курса (COURSE_PAGE_MODE): 'lazy', 'full' или 'stream'."""
+    return getattr(settings, 'COURSE_PAGE_MODE', 'lazy')
+
+
+def course_page_context(course, lessons, mode):
+    """
+    Контекст шаблона course.html.
+
+    :param course: Экземпляр Courses
+    :param lessons: Отрендеренные уроки (режим 'full') или оглавление (get_course_outline)
+    :param str mode: Режим страницы (course_page_mode)
+    :rtype: dict
+    """
+    content = {
+        'lessons': lessons,
         'name': course.title,
+        'course_id': course.course_id,
     }
+    if mode == 'stream':
+        content['stream'] = True
+    elif mode != 'full':
+        content['lazy'] = True
+    return content
 
-def get_lesson_number(lesson_name):
-    import re
-    m = re.search(r'(\d+)', lesson_name)
-    return int(m.group(1)) if m else float('inf')
+
+def resolve_lessons(course_path):
+    """
+    Список уроков курса.
+
+    Список берётся из манифеста курса, папка не сканируется.
+
+    :param str course_path: Путь к папке курса
+    :return: отсортированные имена файлов уроков
+    :rtype: list
+    """
+    return [entry['name'] for entry in get_manifest(course_path)['lessons']]
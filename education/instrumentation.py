@@ -0,0 +1,149 @@
+"""Замеры этапов цепочки рендеринга уроков.
+
+``Handler.handle`` при включённых замерах записывает для каждого этапа
+время выполнения ``process``, размер входных и выходных данных и
+попадания в кэш блоков кода. Статистика копится в памяти процесса,
+периодически пишется в лог и отдаётся staff-пользователям через
+``PipelineStatsView``.
+
+Замеры включаются настройкой ``LESSON_STAGE_STATS`` или на лету —
+файлом-флагом ``LESSON_STAGE_STATS_FLAG`` (``set_enabled``), без
+изменения кода. Файл общий для всех процессов на машине (воркеров
+gunicorn), поэтому переключение доходит до каждого из них не позже чем
+через ``FLAG_TTL`` секунд; в выключенном состоянии цена — одно сравнение
+времени на этап.
+
+Сама статистика при этом своя у каждого процесса: воркер копит и пишет
+в лог только свои замеры, а ``PipelineStatsView`` отдаёт статистику
+того воркера, что обработал запрос (его pid есть в ответе).
+"""
+
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from education.atomic import atomic_write
+
+logger = logging.getLogger('app')
+
+FLAG_TTL = 5.0
+
+
+def flag_path():
+    """Путь к файлу-флагу замеров."""
+    return getattr(settings, 'LESSON_STAGE_STATS_FLAG', None) or os.path.join(settings.MEDIA_ROOT, '.stage-stats')
+
+
+def read_flag():
+    """Значение файла-флага: True/False или None, если флага нет."""
+    try:
+        with open(flag_path(), 'r', encoding='ascii') as f:
+            return f.read().strip() == '1'
+    except OSError:
+        return None
+
+
+def payload_size(value):
+    """Примерный размер данных этапа в байтах (строки в UTF-8)."""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, dict):
+        return sum(payload_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    return 0
+
+
+class StageStats:
+    """Статистика этапов в пределах процесса; флаг включения — общий (файл)."""
+
+    FIELDS = ('calls', 'seconds', 'bytes_in', 'bytes_out', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._flag = None
+        self._flag_checked = 0.0
+
+    def enabled(self):
+        """Включены ли замеры (файл-флаг перечитывается раз в FLAG_TTL секунд)."""
+        now = time.monotonic()
+        if now - self._flag_checked > FLAG_TTL:
+            self._flag = read_flag()
+            self._flag_checked = now
+        if self._flag is not None:
+            return self._flag
+        return getattr(settings, 'LESSON_STAGE_STATS', False)
+
+    def set_enabled(self, value):
+        """
+        Включает или выключает замеры на лету во всех процессах.
+
+        Текущий процесс видит новое значение сразу, остальные — после
+        истечения FLAG_TTL.
+
+        :param value: True/False или None — вернуться к настройке LESSON_STAGE_STATS
+        """
+        path = flag_path()
+        if value is None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        else:
+            atomic_write(path, '1' if value else '0')
+        self._flag = value if value is None else bool(value)
+        self._flag_checked = time.monotonic()
+
+    def record(self, stage, seconds, bytes_in=0, bytes_out=0, cache_hits=0, cache_misses=0):
+        """Добавляет один вызов этапа к статистике."""
+        with self._lock:
+            row = self._stages.get(stage)
+            if row is None:
+                row = self._stages[stage] = dict.fromkeys(self.FIELDS, 0)
+            row['calls'] += 1
+            row['seconds'] += seconds
+            row['bytes_in'] += bytes_in
+            row['bytes_out'] += bytes_out
+            row['cache_hits'] += cache_hits
+            row['cache_misses'] += cache_misses
+            self._calls += 1
+            log_now = self._calls % getattr(settings, 'LESSON_STAGE_STATS_LOG_EVERY', 500) == 0
+        if log_now:
+            self.log_summary()
+
+    def snapshot(self):
+        """
+        Копия статистики с производными средними.
+
+        :return: этап → счётчики, плюс avg_ms на вызов
+        :rtype: dict
+        """
+        with self._lock:
+            stages = {name: dict(row) for name, row in self._stages.items()}
+        for row in stages.values():
+            row['avg_ms'] = round(row['seconds'] * 1000 / row['calls'], 3) if row['calls'] else 0.0
+            row['seconds'] = round(row['seconds'], 6)
+        return stages
+
+    def reset(self):
+        """Обнуляет статистику процесса."""
+        with self._lock:
+            self._stages.clear()
+            self._calls = 0
+
+    def log_summary(self):
+        """Пишет сводку по этапам в лог."""
+        for name, row in sorted(self.snapshot().items()):
+            logger.info(
+                f"[stages pid={os.getpid()}] {name}: {row['calls']} вызовов, "
+                f"{row['avg_ms']} мс в среднем, {row['bytes_in']} → {row['bytes_out']} байт, "
+                f"кэш {row['cache_hits']}/{row['cache_hits'] + row['cache_misses']}"
+            )
+
+
+stage_stats = StageStats()
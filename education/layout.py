@@ -0,0 +1,43 @@
+"""Раскладка курсов в MEDIA_ROOT.
+
+Курс — папка ``MEDIA_ROOT/<course_id>`` с уроками ``lesson_N.md``,
+задачами в ``tasks/`` и производными файлами в ``build/``. Модуль не
+зависит от остальных модулей приложения, поэтому его импортируют и
+компилятор, и манифест, и представления.
+"""
+
+import os
+import re
+
+from django.conf import settings
+
+LESSON_RE = re.compile(r'lesson_(\d+)\.md$')
+NUMBER_RE = re.compile(r'(\d+)')
+
+
+def get_lesson_number(lesson_name):
+    m = NUMBER_RE.search(lesson_name)
+    return int(m.group(1)) if m else float('inf')
+
+
+def list_lessons(course_path):
+    """
+    Возвращает имена файлов уроков курса, отсортированные по номеру.
+
+    Служебные папки (tasks, build) и прочие файлы пропускаются.
+    """
+    return sorted(
+        (name for name in os.listdir(course_path) if LESSON_RE.match(name)),
+        key=get_lesson_number
+    )
+
+
+def media_course_ids():
+    """Идентификаторы курсов, у которых есть папка в MEDIA_ROOT."""
+    root = settings.MEDIA_ROOT
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        int(name) for name in os.listdir(root)
+        if name.isdigit() and os.path.isdir(os.path.join(root, name))
+    )
@@ -0,0 +1,67 @@
+"""Бенчмарк конвейера рендеринга уроков на базовом корпусе и синтетических курсах."""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+
+from education.benchmark import compare_results, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Замеряет обработчики lesson_chain, get_all_lessons и ViewCourseView, печатает JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lessons', type=int, nargs='+', default=[10, 50],
+            help='Числа уроков синтетических курсов.'
+        )
+        parser.add_argument('--lesson-size', type=int, default=4000, help='Размер урока в символах.')
+        parser.add_argument('--code-density', type=float, default=0.3, help='Доля блоков кода (0..1).')
+        parser.add_argument('--tasks', type=int, default=2, help='Число задач на урок.')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов каждого замера.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--corpus', help='Папка курса-образца; по умолчанию media/49.')
+        parser.add_argument('--output', help='Записать результаты в JSON-файл.')
+        parser.add_argument('--compare', help='JSON прошлого прогона для сравнения.')
+        parser.add_argument(
+            '--in-place', action='store_true',
+            help='Работать в текущей БД (изменения откатываются) вместо отдельной тестовой.'
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['code_density'] <= 1:
+            raise CommandError('--code-density должен быть от 0 до 1')
+
+        old_config = None
+        if not options['in_place']:
+            setup_test_environment()
+            old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run_benchmark(
+                sizes=options['lessons'],
+                lesson_size=options['lesson_size'],
+                code_density=options['code_density'],
+                tasks=options['tasks'],
+                repeat=options['repeat'],
+                corpus_path=options['corpus'],
+                seed=options['seed'],
+            )
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+
+        payload = json.dumps(results, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(payload)
+            self.stdout.write(self.style.SUCCESS(f"Результаты записаны в {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        if options['compare']:
+            with open(options['compare'], 'r', encoding='utf-8') as f:
+                old = json.load(f)
+            for name, before, after, ratio in compare_results(old, results):
+                mark = f'{ratio:.2f}x' if ratio is not None else '—'
+                self.stdout.write(f'{name:<60} {before:>10.3f} {after:>10.3f}  {mark}')
@@ -0,0 +1,37 @@
+"""Компиляция уроков всех курсов из media/ в HTML-артефакты."""
+
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from education.compiler import compile_course
+from education.layout import media_course_ids
+
+
+class Command(BaseCommand):
+    help = 'Компилирует markdown-уроки курсов в HTML-артефакты (build/lesson_N.json).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'course_ids', nargs='*', type=int,
+            help='Идентификаторы курсов; по умолчанию — все курсы в MEDIA_ROOT.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перекомпилировать даже актуальные артефакты.'
+        )
+
+    def handle(self, *args, **options):
+        course_ids = options['course_ids'] or media_course_ids()
+
+        total = 0
+        for course_id in course_ids:
+            course_path = os.path.join(settings.MEDIA_ROOT, str(course_id))
+            if not os.path.isdir(course_path):
+                raise CommandError(f'Курс {course_id} не найден в {settings.MEDIA_ROOT}')
+            compiled = compile_course(course_path, force=options['force'])
+            total += compiled
+            self.stdout.write(f'Курс {course_id}: скомпилировано уроков — {compiled}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово, всего уроков: {total}'))
@@ -0,0 +1,27 @@
+"""Пересборка поискового индекса курсов (education.search)."""
+
+from django.core.management.base import BaseCommand
+
+from education.models import Courses
+from education.search import index_course
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковые документы курсов из названий и текста уроков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'course_ids', nargs='*', type=int,
+            help='Идентификаторы курсов; по умолчанию — все курсы в БД.'
+        )
+
+    def handle(self, *args, **options):
+        course_ids = options['course_ids'] or Courses.objects.values_list('course_id', flat=True)
+        indexed = 0
+        for course_id in course_ids:
+            if index_course(course_id):
+                indexed += 1
+            else:
+                self.stdout.write(f'Курс {course_id}: нет в БД, удалён из индекса')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово, проиндексировано курсов: {indexed}'))
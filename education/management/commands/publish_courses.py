@@ -0,0 +1,33 @@
+"""Публикация курсов статическими страницами для nginx (COURSE_PUBLISH_ROOT)."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from education.layout import media_course_ids
+from education.publish import publish_course, publish_root
+
+
+class Command(BaseCommand):
+    help = 'Публикует анонимные страницы курсов и уроков в COURSE_PUBLISH_ROOT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'course_ids', nargs='*', type=int,
+            help='Идентификаторы курсов; по умолчанию — все курсы в MEDIA_ROOT.'
+        )
+        parser.add_argument('--root', help='Корень публикации вместо COURSE_PUBLISH_ROOT.')
+
+    def handle(self, *args, **options):
+        root = options['root'] or publish_root()
+        if not root:
+            raise CommandError('Не задан COURSE_PUBLISH_ROOT (или --root)')
+
+        published = 0
+        for course_id in options['course_ids'] or media_course_ids():
+            target = publish_course(course_id, root)
+            if target:
+                published += 1
+                self.stdout.write(f'Курс {course_id}: {target}')
+            else:
+                self.stdout.write(f'Курс {course_id}: нет в БД или в MEDIA_ROOT, копия удалена')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово, опубликовано курсов: {published}'))
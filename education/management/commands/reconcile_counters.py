@@ -0,0 +1,22 @@
+"""Сверка счётчиков звёзд и уроков в Courses."""
+
+from django.core.management.base import BaseCommand
+
+from education.methods import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет Courses.stars_count и lessons_count с таблицами звёзд и уроков и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения.')
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(dry_run=options['dry_run'])
+        for row in drift:
+            self.stdout.write(
+                f"Курс {row['course_id']}: звёзды {row['stars_count']} → {row['actual_stars']}, "
+                f"уроки {row['lessons_count']} → {row['actual_lessons']}"
+            )
+        verb = 'найдено' if options['dry_run'] else 'исправлено'
+        self.stdout.write(self.style.SUCCESS(f'Готово, {verb} расхождений: {len(drift)}'))
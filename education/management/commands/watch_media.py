@@ -0,0 +1,34 @@
+"""Слежение за папками курсов в MEDIA_ROOT и точечное обновление кэшей и манифестов."""
+
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from education.watcher import watch
+
+
+class Command(BaseCommand):
+    help = 'Следит за media/<course_id>/ и обновляет артефакты и манифесты изменённых курсов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--polling', action='store_true',
+            help='Опрашивать папки, даже если доступен inotify.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Период опроса в секундах (по умолчанию MEDIA_WATCHER_INTERVAL).'
+        )
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+        self.stdout.write('Наблюдатель запущен, Ctrl+C для остановки.')
+        interval = options['interval'] or getattr(settings, 'MEDIA_WATCHER_INTERVAL', 2.0)
+        try:
+            watch(stop_event, polling=options['polling'], interval=interval)
+        except KeyboardInterrupt:
+            stop_event.set()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS('Наблюдатель остановлен'))
@@ -0,0 +1,229 @@
+"""Манифест курса: список уроков без сканирования папки.
+
+``<course>/build/manifest.json`` хранит порядок уроков, имена файлов,
+размеры, mtime и sha1 содержимого, общий хэш курса и номер ревизии —
+версию курса, которая увеличивается при каждом обновлении. Манифест
+обновляется путями записи (загрузка курса, редактор), поэтому странице
+курса достаточно прочитать один небольшой файл вместо listdir и
+сортировки по регулярному выражению.
+
+Чтение-изменение-запись манифеста выполняется под flock на
+``build/manifest.lock``, так что одновременные сохранения уроков из
+разных процессов не теряют записи друг друга. При чтении манифест
+сверяется с mtime папки курса и mtime/размером файлов уроков; если урок
+изменили, добавили или удалили в обход путей записи, манифест
+пересобирается.
+"""
+
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+from education.atomic import atomic_file, file_lock
+from education.compiler import BUILD_DIR
+from education.layout import get_lesson_number, list_lessons
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_LOCK_NAME = 'manifest.lock'
+MANIFEST_VERSION = 2
+
+
+def manifest_path(course_path):
+    """Путь к манифесту курса."""
+    return os.path.join(course_path, BUILD_DIR, MANIFEST_NAME)
+
+
+@contextmanager
+def _locked(course_path):
+    """Исключительный flock на build/manifest.lock курса."""
+    with file_lock(os.path.join(course_path, BUILD_DIR, MANIFEST_LOCK_NAME)):
+        yield
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _lesson_entry(course_path, lesson_name, refreshed=False):
+    path = os.path.join(course_path, lesson_name)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    st = os.stat(path)
+    return {
+        'order': get_lesson_number(lesson_name),
+        'name': lesson_name,
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha1': digest,
+        'refreshed': refreshed,
+    }
+
+
+def _tasks_mtime(course_path):
+    """Самое позднее изменение задач: папки (добавление, удаление) или любого файла в ней."""
+    tasks_dir = os.path.join(course_path, 'tasks')
+    try:
+        mtimes = [os.stat(tasks_dir).st_mtime_ns]
+        mtimes.extend(entry.stat().st_mtime_ns for entry in os.scandir(tasks_dir) if entry.is_file())
+    except OSError:
+        return 0
+    return max(mtimes)
+
+
+def _write(course_path, lessons, revision):
+    lessons.sort(key=lambda entry: entry['order'])
+    tasks_mtime = _tasks_mtime(course_path)
+
+    course_hash = hashlib.sha1()
+    for entry in lessons:
+        course_hash.update(f"{entry['name']}:{entry['sha1']}\n".encode('utf-8'))
+    course_hash.update(str(tasks_mtime).encode('utf-8'))
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'revision': revision,
+        'course_mtime_ns': _mtime_ns(course_path),
+        'tasks_mtime_ns': tasks_mtime,
+        'hash': course_hash.hexdigest(),
+        'lessons': lessons,
+    }
+    with atomic_file(manifest_path(course_path), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+def read_manifest(course_path):
+    """
+    Читает манифест курса.
+
+    :return: манифест или None, если его нет или он повреждён
+    :rtype: dict | None
+    """
+    try:
+        with open(manifest_path(course_path), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def is_current(course_path, manifest):
+    """
+    Совпадает ли манифест с папкой курса.
+
+    Сверяются mtime папки курса (файлы добавлялись или удалялись) и
+    mtime и размер каждого урока из манифеста (правка на месте).
+    """
+    if manifest.get('course_mtime_ns') != _mtime_ns(course_path):
+        return False
+    for entry in manifest['lessons']:
+        try:
+            st = os.stat(os.path.join(course_path, entry['name']))
+        except OSError:
+            return False
+        if st.st_mtime_ns != entry['mtime_ns'] or st.st_size != entry['size']:
+            return False
+    return True
+
+
+def _update(course_path, lesson_name=None, refreshed=False):
+    manifest = read_manifest(course_path)
+    revision = manifest.get('revision', 0) + 1 if manifest else 1
+    if manifest is None or lesson_name is None:
+        lessons = [_lesson_entry(course_path, name, refreshed) for name in list_lessons(course_path)]
+        return _write(course_path, lessons, revision)
+
+    lessons = [entry for entry in manifest['lessons'] if entry['name'] != lesson_name]
+    if os.path.isfile(os.path.join(course_path, lesson_name)):
+        lessons.append(_lesson_entry(course_path, lesson_name, refreshed))
+    return _write(course_path, lessons, revision)
+
+
+def update_manifest(course_path, lesson_name=None):
+    """
+    Обновляет манифест курса.
+
+    Если передан lesson_name и манифест уже есть, пересчитывается только
+    запись этого урока (или она удаляется, если файла больше нет);
+    иначе манифест строится заново по содержимому папки. В обоих случаях
+    ревизия курса увеличивается на единицу.
+
+    Пересчитанные записи помечаются ``refreshed``: производные файлы урока
+    уже обновлены (education.refresh), и наблюдателю не нужно делать это
+    ещё раз (см. refreshed_lessons). Записи, которые get_manifest
+    пересобирает при чтении, этой отметки не получают.
+
+    :param str course_path: Путь к папке курса
+    :param lesson_name: Имя изменённого файла урока
+    :return: новый манифест
+    :rtype: dict
+    """
+    with _locked(course_path):
+        return _update(course_path, lesson_name, refreshed=True)
+
+
+def update_manifest_tasks(course_path):
+    """
+    Обновляет в манифесте только отметку задач (tasks_mtime_ns и хэш курса).
+
+    Записи уроков не пересчитываются; ревизия увеличивается. Если
+    манифеста ещё нет, он строится целиком.
+
+    :param str course_path: Путь к папке курса
+    :return: новый манифест
+    :rtype: dict
+    """
+    with _locked(course_path):
+        manifest = read_manifest(course_path)
+        if manifest is None:
+            return _update(course_path, refreshed=True)
+        return _write(course_path, manifest['lessons'], manifest.get('revision', 0) + 1)
+
+
+def get_manifest(course_path):
+    """Манифест курса; если его нет или он не совпадает с папкой, строит по папке."""
+    manifest = read_manifest(course_path)
+    if manifest is not None and is_current(course_path, manifest):
+        return manifest
+    with _locked(course_path):
+        manifest = read_manifest(course_path)
+        if manifest is not None and is_current(course_path, manifest):
+            return manifest
+        return _update(course_path)
+
+
+def refreshed_lessons(course_path):
+    """
+    Уроки, чьи производные файлы уже обновлены путём записи.
+
+    Это уроки с отметкой ``refreshed`` в манифесте, файл которых с тех пор
+    не менялся (те же mtime и размер).
+
+    :param str course_path: Путь к папке курса
+    :rtype: set
+    """
+    manifest = read_manifest(course_path)
+    if manifest is None:
+        return set()
+    names = set()
+    for entry in manifest['lessons']:
+        if not entry.get('refreshed'):
+            continue
+        try:
+            st = os.stat(os.path.join(course_path, entry['name']))
+        except OSError:
+            continue
+        if st.st_mtime_ns == entry['mtime_ns'] and st.st_size == entry['size']:
+            names.add(entry['name'])
+    return names
+
+
+def course_version(course_path):
+    """Ревизия курса: растёт при каждом сохранении урока."""
+    return get_manifest(course_path).get('revision', 0)
@@ -0,0 +1,167 @@
+"""Переиспользуемые экземпляры Markdown.
+
+``markdown.markdown()`` на каждый вызов создаёт новый ``Markdown`` и заново
+загружает расширения. Здесь у каждого потока свой заранее настроенный
+экземпляр, который сбрасывается через ``reset()`` перед каждым документом.
+Экземпляр привязан к pid, поэтому после fork (пул процессов, gunicorn)
+дочерний процесс создаёт собственный.
+
+Подсветка блоков кода (Pygments) запоминается в ``code_block_cache``:
+одинаковый фрагмент подсвечивается один раз на процесс, в каком бы
+уроке, задаче или курсе он ни встретился.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import markdown
+from markdown.extensions import Extension
+from markdown.extensions.codehilite import CodeHilite, CodeHiliteExtension
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'codehilite', 'tables']
+
+_local = threading.local()
+
+
+class CodeBlockCache:
+    """
+    LRU-кэш подсвеченных блоков кода с ограничением по объёму HTML.
+
+    Ключ — язык, sha1 исходника, стиль и остальные настройки codehilite.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def highlight(self, src, lang, config):
+        """
+        Возвращает HTML блока кода так же, как это сделал бы fenced_code + codehilite.
+
+        :param str src: Исходный код блока
+        :param lang: Язык из ограждения или None
+        :param dict config: Настройки CodeHiliteExtension
+        :rtype: str
+        """
+        options = config.copy()
+        style = options.pop('pygments_style', 'default')
+        key = (
+            lang,
+            hashlib.sha1(src.encode('utf-8')).hexdigest(),
+            style,
+            repr(sorted(options.items())),
+        )
+        with self._lock:
+            html = self._blocks.get(key)
+            if html is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = CodeHilite(src, lang=lang, style=style, **options).hilite(shebang=False)
+        with self._lock:
+            if key not in self._blocks:
+                self._blocks[key] = html
+                self._size += len(html)
+            while self._size > self.max_bytes and self._blocks:
+                _, evicted = self._blocks.popitem(last=False)
+                self._size -= len(evicted)
+        return html
+
+    def stats(self):
+        """Счётчики кэша: попадания, промахи, число блоков и объём HTML."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._blocks),
+                'bytes': self._size,
+            }
+
+    def clear(self):
+        """Очищает кэш и счётчики."""
+        with self._lock:
+            self._blocks.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+
+code_block_cache = CodeBlockCache()
+
+
+class CachedFencedBlockPreprocessor(FencedBlockPreprocessor):
+    """
+    Подсвечивает простые блоки ```lang через ``code_block_cache``.
+
+    Блоки с атрибутами ({...}) и hl_lines пропускаются — их, как обычно,
+    обработает штатный препроцессор fenced_code, который идёт следом.
+    """
+
+    def run(self, lines):
+        if not self.checked_for_deps:
+            for ext in self.md.registeredExtensions:
+                if isinstance(ext, CodeHiliteExtension):
+                    self.codehilite_conf = ext.getConfigs()
+            self.checked_for_deps = True
+
+        if not (self.codehilite_conf and self.codehilite_conf['use_pygments']):
+            return lines
+
+        text = "\n".join(lines)
+        index = 0
+        while True:
+            m = self.FENCED_BLOCK_RE.search(text, index)
+            if not m:
+                break
+            if m.group('attrs') or m.group('hl_lines'):
+                index = m.end()
+                continue
+
+            code = code_block_cache.highlight(
+                m.group('code'), m.group('lang') or None, self.codehilite_conf
+            )
+            placeholder = self.md.htmlStash.store(code)
+            text = f'{text[:m.start()]}\n{placeholder}\n{text[m.end():]}'
+            index = m.start() + 1 + len(placeholder)
+        return text.split("\n")
+
+
+class CachedFencedCodeExtension(Extension):
+    """Ставит ``CachedFencedBlockPreprocessor`` перед штатным fenced_code."""
+
+    def extendMarkdown(self, md):
+        md.preprocessors.register(
+            CachedFencedBlockPreprocessor(md, {}), 'cached_fenced_code_block', 26
+        )
+
+
+def get_markdown():
+    """Возвращает экземпляр Markdown текущего потока."""
+    engine = getattr(_local, 'engine', None)
+    if engine is None or _local.pid != os.getpid():
+        engine = markdown.Markdown(
+            extensions=MARKDOWN_EXTENSIONS + [CachedFencedCodeExtension()]
+        )
+        _local.engine = engine
+        _local.pid = os.getpid()
+    return engine
+
+
+def render_markdown(text):
+    """
+    Конвертирует markdown в HTML.
+
+    :param str text: Исходный markdown
+    :return: HTML
+    :rtype: str
+    """
+    return get_markdown().reset().convert(text)
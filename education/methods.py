@@ -1,28 +1,115 @@
 """Вынесенные функции для работы сайта."""
 
-from django.db.models import OuterRef, Count, Exists
+import os
+from functools import lru_cache
+
+import yaml
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 from authentication.models import User
-from education.models import Stars, Courses
+from education.models import Lessons, Stars, Courses
+
+
+METADATA_OPEN = '[metadata]'
+METADATA_CLOSE = '[/metadata]'
+FRONT_MATTER = '---'
+
+# Сколько символов начала файла читать ради одних метаданных.
+METADATA_HEAD_SIZE = 4096
+
+
+def _metadata_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, dict)):
+        return value
+    return str(value)
+
+
+def parse_metadata(md_content):
+    """
+    Разбирает метаданные в начале документа за один проход.
+
+    Поддерживаются блок ``[metadata] ... [/metadata]`` и YAML front matter
+    (``---`` ... ``---``). Смотрится только начало документа; строки
+    без двоеточия пропускаются.
+
+    :param str md_content: Текст урока
+    :return: (метаданные, смещение начала тела) или (метаданные, None),
+             если блок открыт, но не закрыт
+    :rtype: tuple
+    """
+    start = len(md_content) - len(md_content.lstrip())
+
+    if md_content.startswith(METADATA_OPEN, start):
+        head_start = start + len(METADATA_OPEN)
+        head_end = md_content.find(METADATA_CLOSE, head_start)
+        if head_end == -1:
+            return {}, None
+        metadata = {}
+        for line in md_content[head_start:head_end].splitlines():
+            key, sep, value = line.partition(':')
+            if sep and key.strip():
+                metadata[key.strip()] = value.strip()
+        body_start = head_end + len(METADATA_CLOSE)
+
+    elif md_content.startswith(FRONT_MATTER + '\n', start):
+        head_start = start + len(FRONT_MATTER) + 1
+        head_end = md_content.find('\n' + FRONT_MATTER, head_start - 1)
+        if head_end == -1:
+            return {}, None
+        try:
+            loaded = yaml.safe_load(md_content[head_start:head_end])
+        except yaml.YAMLError:
+            return {}, 0
+        if not isinstance(loaded, dict):
+            return {}, 0
+        metadata = {str(k): _metadata_value(v) for k, v in loaded.items()}
+        body_start = head_end + len(FRONT_MATTER) + 1
+
+    else:
+        return {}, 0
+
+    while body_start < len(md_content) and md_content[body_start].isspace():
+        body_start += 1
+    return metadata, body_start
 
 
 def get_metadata(md_content):
     """Извлекает метаданные из файла."""
-    metadata = {}
-    metadata_start = md_content.find("[metadata]")
-    metadata_end = md_content.find("[/metadata]")
-
-    if metadata_start != -1 and metadata_end != -1:
-        metadata_lines =\
-            md_content[metadata_start + len("[metadata]"):metadata_end].strip().splitlines()
-        for line in metadata_lines:
-            if line.strip():
-                key, value = line.split(": ", 1)
-                metadata[key.strip()] = value.strip()
+    metadata, body_start = parse_metadata(md_content)
+    if not body_start:
+        return metadata, md_content
+    return metadata, md_content[body_start:]
+
+
+@lru_cache(maxsize=2048)
+def _read_metadata(path, mtime_ns, size):
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(METADATA_HEAD_SIZE)
+        metadata, body_start = parse_metadata(head)
+        if body_start is None:
+            # Блок метаданных длиннее прочитанного начала — дочитываем файл.
+            metadata, _ = parse_metadata(head + f.read())
+    return metadata
 
-        md_content = md_content[metadata_end + len("[/metadata]"):].strip()
 
-    return metadata, md_content
+def read_metadata(path):
+    """
+    Читает только метаданные урока, не загружая весь файл.
+
+    Результат запоминается для каждой версии файла (mtime + размер).
+
+    :param str path: Путь к markdown-файлу
+    :return: словарь метаданных (пустой, если файла нет)
+    :rtype: dict
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}
+    return dict(_read_metadata(path, st.st_mtime_ns, st.st_size))
 
 
 def get_most_popular_courses(user: User):
@@ -33,11 +120,38 @@ def get_most_popular_courses(user: User):
             user=user
         )
         popular_courses = Courses.objects.prefetch_related('topics').annotate(
-            stars_count=Count('stars'),
             is_stared=Exists(subquery)
         ).order_by('-stars_count')[:3]
     else:
-        popular_courses = Courses.objects.prefetch_related('topics').annotate(
-            stars_count=Count('stars')
-        ).order_by('-stars_count')[:3]
+        popular_courses = Courses.objects.prefetch_related('topics').order_by('-stars_count')[:3]
     return popular_courses
+
+
+def _actual_count(model):
+    """Подзапрос: реальное число строк model для курса."""
+    rows = model.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(n=Count('pk'))
+    return Coalesce(Subquery(rows.values('n')), 0)
+
+
+def reconcile_counters(dry_run=False):
+    """
+    Сверяет Courses.stars_count и lessons_count с таблицами Stars и Lessons.
+
+    :param bool dry_run: Только найти расхождения, не исправляя
+    :return: расхождения: course_id, stars_count, actual_stars, lessons_count, actual_lessons
+    :rtype: list
+    """
+    drift = list(Courses.objects.annotate(
+        actual_stars=_actual_count(Stars),
+        actual_lessons=_actual_count(Lessons),
+    ).exclude(
+        stars_count=F('actual_stars'), lessons_count=F('actual_lessons')
+    ).values('course_id', 'stars_count', 'actual_stars', 'lessons_count', 'actual_lessons'))
+
+    if drift and not dry_run:
+        # Пересчёт прямо в UPDATE: звёзды, поставленные между проверкой и исправлением, не теряются.
+        Courses.objects.filter(course_id__in=[row['course_id'] for row in drift]).update(
+            stars_count=_actual_count(Stars),
+            lessons_count=_actual_count(Lessons),
+        )
+    return drift
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:25
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-индекс по tsvector в PostgreSQL, таблица FTS5 в SQLite."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX education_coursesearch_vector_gin '
+            'ON education_coursesearchdocument USING gin (vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE education_coursesearch_fts '
+            "USING fts5(title, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS education_coursesearch_vector_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS education_coursesearch_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0024_remove_reporttopic_course_reporttopic_topic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchDocument',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='education.courses')),
+                ('title', models.TextField()),
+                ('body', models.TextField()),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Courses = apps.get_model('education', 'Courses')
+    Stars = apps.get_model('education', 'Stars')
+    Lessons = apps.get_model('education', 'Lessons')
+
+    def count(model):
+        rows = model.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(n=Count('pk'))
+        return Coalesce(Subquery(rows.values('n')), 0)
+
+    Courses.objects.update(stars_count=count(Stars), lessons_count=count(Lessons))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0026_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courses',
+            name='lessons_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='courses',
+            name='stars_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
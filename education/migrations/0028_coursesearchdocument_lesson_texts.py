@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0027_courses_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursesearchdocument',
+            name='lesson_texts',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import F
 from authentication.models import User
 
 
@@ -24,6 +26,12 @@ class Courses(models.Model):
     :ivar models.TextField title: Название курса
     :ivar models.ForeignKey author: Автор курса (пользователь)
     :ivar models.ManyToManyField topics: Темы, связанные с курсом
+    :ivar models.PositiveIntegerField stars_count: Число звёзд (поддерживается Stars.save/delete)
+    :ivar models.PositiveIntegerField lessons_count: Число уроков (поддерживается Lessons.save/delete)
+
+    Счётчики меняются F()-обновлением в той же транзакции, что и звезда
+    или урок. Массовые операции (bulk_create, QuerySet.delete) их обходят —
+    расхождения исправляет команда reconcile_counters.
     """
     course_id = models.AutoField(primary_key=True)
     title = models.TextField()
@@ -36,6 +44,31 @@ class Courses(models.Model):
         blank=True,
         verbose_name='Темы курса'
     )
+    stars_count = models.PositiveIntegerField(default=0, db_index=True)
+    lessons_count = models.PositiveIntegerField(default=0)
+
+
+class CourseSearchDocument(models.Model):
+    """Поисковый документ курса (см. education.search).
+
+    В PostgreSQL ищется по ``vector`` с GIN-индексом, в SQLite — по
+    таблице FTS5 ``education_coursesearch_fts`` с rowid = course_id;
+    оба создаются миграцией только для своей СУБД.
+
+    :ivar models.OneToOneField course: Курс
+    :ivar models.TextField title: Название курса
+    :ivar models.TextField body: Названия уроков и текст отрендеренных уроков
+    :ivar models.JSONField lesson_texts: Имя файла урока → [название, текст]; из них собирается body,
+                                         так что правка урока пересчитывает только его запись
+    :ivar SearchVectorField vector: tsvector по title (вес A) и body (вес B), только PostgreSQL
+    """
+    course = models.OneToOneField(
+        Courses, on_delete=models.CASCADE,
+        primary_key=True, related_name='search_document')
+    title = models.TextField()
+    body = models.TextField()
+    lesson_texts = models.JSONField(default=dict)
+    vector = SearchVectorField(null=True)
 
 
 class Lessons(models.Model):
@@ -54,6 +87,22 @@ class Lessons(models.Model):
         unique_together = ('course', 'order')
         ordering = ['order']
 
+    def save(self, *args, **kwargs):
+        """Сохраняет урок; при создании увеличивает Courses.lessons_count."""
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Courses.objects.filter(pk=self.course_id).update(lessons_count=F('lessons_count') + 1)
+
+    def delete(self, *args, **kwargs):
+        """Удаляет урок и уменьшает Courses.lessons_count, но не ниже нуля."""
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            if deleted[1].get(self._meta.label):
+                Courses.objects.filter(pk=self.course_id, lessons_count__gt=0).update(lessons_count=F('lessons_count') - 1)
+        return deleted
+
 
 class CourseProgress(models.Model):
     """Модель прогресса для курса
@@ -92,6 +141,22 @@ class Stars(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     data = models.IntegerField(default=0)
 
+    def save(self, *args, **kwargs):
+        """Сохраняет звезду; при создании увеличивает Courses.stars_count."""
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Courses.objects.filter(pk=self.course_id).update(stars_count=F('stars_count') + 1)
+
+    def delete(self, *args, **kwargs):
+        """Удаляет звезду и уменьшает Courses.stars_count, но не ниже нуля."""
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            if deleted[1].get(self._meta.label):
+                Courses.objects.filter(pk=self.course_id, stars_count__gt=0).update(stars_count=F('stars_count') - 1)
+        return deleted
+
 
 class ReportCourse(models.Model):
     """Модель жалобы на курс.
@@ -0,0 +1,80 @@
+"""Keyset-пагинация списков курсов.
+
+Вместо OFFSET страница продолжается с курса, следующего за последним
+показанным: ``?after=<course_id>``. Запрос страницы — это
+``WHERE course_id > after ORDER BY course_id LIMIT n + 1`` по первичному
+ключу, поэтому его цена не зависит ни от номера страницы, ни от размера
+каталога. Лишняя (n + 1)-я строка нужна только чтобы узнать, есть ли
+следующая страница.
+
+Размер страницы — ``COURSES_PAGE_SIZE``, клиент может запросить меньший
+или больший через ``?limit=``, но не больше ``COURSES_PAGE_SIZE_MAX``.
+"""
+
+from django.conf import settings
+from django.http import JsonResponse
+
+
+def page_size(request):
+    """Размер страницы из ?limit= с учётом настроек."""
+    default = getattr(settings, 'COURSES_PAGE_SIZE', 20)
+    try:
+        size = int(request.GET.get('limit', default))
+    except ValueError:
+        size = default
+    return max(1, min(size, getattr(settings, 'COURSES_PAGE_SIZE_MAX', 100)))
+
+
+def page_cursor(request):
+    """Курсор из ?after= или None для первой страницы."""
+    try:
+        return int(request.GET['after'])
+    except (KeyError, ValueError):
+        return None
+
+
+def paginate(qs, request, key='course_id'):
+    """
+    Одна страница queryset-а по возрастанию ключа.
+
+    :param qs: QuerySet курсов (сортировка будет заменена на key)
+    :param request: HTTP-запрос Django (?after=, ?limit=)
+    :param str key: Уникальное поле, по которому идёт пагинация
+    :return: (объекты страницы, курсор следующей страницы или None)
+    :rtype: tuple
+    """
+    size = page_size(request)
+    after = page_cursor(request)
+    qs = qs.order_by(key)
+    if after is not None:
+        qs = qs.filter(**{f'{key}__gt': after})
+    items = list(qs[:size + 1])
+    if len(items) > size:
+        return items[:size], getattr(items[size - 1], key)
+    return items, None
+
+
+def page_context(request, next_cursor):
+    """
+    Контекст шаблона для ссылки «Показать ещё».
+
+    :return: {'next': курсор, 'next_query': строка запроса следующей страницы}
+    :rtype: dict
+    """
+    query = request.GET.copy()
+    query.pop('format', None)
+    query['after'] = next_cursor
+    return {
+        'next': next_cursor,
+        'next_query': query.urlencode() if next_cursor is not None else '',
+    }
+
+
+def wants_json(request):
+    """Запрошен ли JSON-вариант списка (?format=json)."""
+    return request.GET.get('format') == 'json'
+
+
+def courses_json(courses, next_cursor):
+    """JSON-вариант страницы списка курсов для бесконечной прокрутки."""
+    return JsonResponse({'status': 'ok', 'courses': courses, 'next': next_cursor})
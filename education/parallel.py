@@ -0,0 +1,120 @@
+"""Параллельный рендеринг уроков холодного курса.
+
+Если в кэше нет нескольких уроков курса, они рендерятся одновременно
+в пуле из ``LESSON_RENDER_WORKERS`` процессов (при невозможности
+запустить процессы — потоков), а результаты кладутся в кэш рендеринга.
+После этого ``get_all_lessons`` проходит по урокам в обычном порядке
+и забирает их из кэша. Размер пула ограничен настройкой, поэтому даже
+большой курс не занимает больше заданного числа ядер.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+
+from education.cache import cached_lesson_chain
+from education.compiler import artifact_chain
+
+logger = logging.getLogger('app')
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _render(data):
+    return artifact_chain.handle(data)
+
+
+def _workers():
+    return getattr(settings, 'LESSON_RENDER_WORKERS', 0)
+
+
+def get_executor():
+    """Возвращает пул рендеринга, создавая его при первом обращении."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            if getattr(settings, 'LESSON_RENDER_EXECUTOR', 'process') == 'process':
+                try:
+                    # spawn, а не fork: процесс веб-сервера может быть многопоточным.
+                    _executor = ProcessPoolExecutor(
+                        max_workers=_workers(),
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=django.setup,
+                    )
+                except (OSError, NotImplementedError, ValueError) as e:
+                    logger.warning(f"Пул процессов недоступен, рендерим в потоках: {e}")
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_workers(),
+                    thread_name_prefix='lesson-render',
+                )
+        return _executor
+
+
+def shutdown_executor(wait=True):
+    """Останавливает пул; следующий вызов создаст его заново по текущим настройкам."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _fallback_to_threads():
+    global _executor
+    with _lock:
+        broken, _executor = _executor, ThreadPoolExecutor(
+            max_workers=_workers(),
+            thread_name_prefix='lesson-render',
+        )
+    broken.shutdown(wait=False)
+    logger.warning("Пул процессов рендеринга сломан, переключаемся на потоки")
+
+
+def prerender_lessons(course_path, lesson_names):
+    """
+    Параллельно рендерит уроки курса, которых нет в кэше.
+
+    Ничего не делает, если LESSON_RENDER_WORKERS < 2 или холодных уроков меньше двух.
+    Уроки, упавшие с ошибкой, пропускаются: их отрендерит и покажет
+    обычный последовательный проход.
+
+    :param str course_path: Путь к папке курса
+    :param lesson_names: Имена файлов уроков
+    :return: число уроков, отрендеренных в пуле
+    :rtype: int
+    """
+    if _workers() < 2:
+        return 0
+
+    misses = []
+    for lesson_name in lesson_names:
+        data = (os.path.join(course_path, lesson_name), lesson_name, course_path)
+        key = cached_lesson_chain.make_key(data)
+        if key is not None and cached_lesson_chain.get(key) is None:
+            misses.append((key, data))
+    if len(misses) < 2:
+        return 0
+
+    executor = get_executor()
+    futures = [(key, executor.submit(_render, data)) for key, data in misses]
+    rendered = 0
+    broken = False
+    for key, future in futures:
+        try:
+            cached_lesson_chain.set(key, future.result())
+            rendered += 1
+        except BrokenProcessPool:
+            broken = True
+        except Exception as e:
+            logger.debug(f"Урок {key} не отрендерился в пуле: {e}")
+    if broken:
+        _fallback_to_threads()
+    return rendered
@@ -0,0 +1,152 @@
+"""Публикация курсов статическими файлами для nginx.
+
+Страница курса в том виде, в каком её видит анонимный посетитель, и
+каждый урок (JSON и HTML-фрагмент) записываются в ``COURSE_PUBLISH_ROOT``
+по тем же путям, что и URL::
+
+    <root>/courses/<course_id>/index.html
+    <root>/courses/<course_id>/lessons/<order>/index.json
+    <root>/courses/<course_id>/lessons/<order>/index.html
+
+Рядом с каждым файлом лежит сжатый вариант ``.gz`` для ``gzip_static``.
+nginx отдаёт файлы через ``try_files`` запросам без cookie сессии, а всё
+остальное проксирует в Django (см. nginx.conf). Прогресс и прочие данные
+пользователя страница и так получает отдельными JSON-запросами, поэтому
+анонимная версия одна на всех.
+
+Публикация выключена, пока не задан ``COURSE_PUBLISH_ROOT``; курс
+переиздаётся при каждом refresh_course (загрузка, сохранение урока,
+наблюдатель за медиа) и удаляется вместе с курсом (сигнал post_delete,
+то есть и при каскадном удалении, и при ``QuerySet.delete``). Если
+изменился один урок, переписываются только его файлы и страница курса.
+
+Страница публикуется без CSRF-токена: один токен, вшитый в файл, достался
+бы всем посетителям. Анонимной странице он не нужен — запросы с токеном
+(прогресс) страница делает только для вошедшего пользователя, а такому
+nginx отдаёт страницу из Django.
+"""
+
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.http import HttpRequest
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from education.atomic import atomic_write
+from education.compression import write_variants
+from education.files import (
+    course_page_context, course_page_mode, get_all_lessons, get_course_outline, get_lessons_map,
+    lesson_payload, render_lesson, resolve_lessons
+)
+from education.layout import LESSON_RE
+from education.models import Courses
+
+
+def publish_root():
+    """Корень статических страниц или None, если публикация выключена."""
+    return getattr(settings, 'COURSE_PUBLISH_ROOT', None)
+
+
+def course_dir(course_id, root=None):
+    """Папка опубликованного курса."""
+    return os.path.join(root or publish_root(), 'courses', str(course_id))
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = text.encode('utf-8')
+    # Сжатые варианты пишутся раньше оригинала: try_files проверяет оригинал.
+    write_variants(path, data)
+    atomic_write(path, data)
+
+
+def _anonymous_request(course_id):
+    """GET-запрос анонимного посетителя к странице курса для контекстных процессоров."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = reverse('course', args=[course_id])
+    request.user = AnonymousUser()
+    return request
+
+
+def publish_course(course_id, root=None, lesson_name=None):
+    """
+    Публикует анонимную страницу курса и его уроки.
+
+    Уроки, которых больше нет, из опубликованной копии удаляются.
+
+    :param int course_id: Идентификатор курса
+    :param root: Корень публикации; по умолчанию COURSE_PUBLISH_ROOT
+    :param lesson_name: Изменённый урок: переписываются только его файлы и
+                        страница курса; None (или курс ещё не опубликован) — все уроки
+    :return: папка опубликованного курса или None, если публиковать нечего
+    :rtype: str | None
+    """
+    root = root or publish_root()
+    if not root:
+        return None
+    course = Courses.objects.filter(course_id=course_id).first()
+    course_path = os.path.join(settings.MEDIA_ROOT, str(course_id))
+    if course is None or not os.path.isdir(course_path):
+        unpublish_course(course_id, root)
+        return None
+
+    target = course_dir(course_id, root)
+    lessons = resolve_lessons(course_path)
+    lessons_map = get_lessons_map(course)
+
+    outline = get_course_outline(course, lessons, course_path, lessons_map)
+    changed = None
+    if lesson_name is not None and os.path.isfile(os.path.join(target, 'index.html')):
+        m = LESSON_RE.match(lesson_name)
+        changed = int(m.group(1)) if m else None
+    published = set()
+    for item in outline:
+        order = item['order']
+        published.add(str(order))
+        if changed is not None and order != changed:
+            continue
+        lesson = render_lesson(course_path, f'lesson_{order}.md', lessons_map.get(order))
+        lesson['order'] = order
+        lesson_dir = os.path.join(target, 'lessons', str(order))
+        _write(os.path.join(lesson_dir, 'index.json'), json.dumps(
+            {'status': 'ok', 'lesson': lesson_payload(lesson, order)}, ensure_ascii=False
+        ))
+        _write(os.path.join(lesson_dir, 'index.html'), render_to_string('lesson_fragment.html', {'lesson': lesson}))
+
+    lessons_root = os.path.join(target, 'lessons')
+    for name in os.listdir(lessons_root) if os.path.isdir(lessons_root) else []:
+        if name not in published:
+            shutil.rmtree(os.path.join(lessons_root, name), ignore_errors=True)
+
+    # Потоковый режим публикуется как полный: файл всё равно пишется целиком.
+    mode = 'full' if course_page_mode() == 'stream' else course_page_mode()
+    if mode == 'full':
+        content = get_all_lessons(course, course_path, lessons, [], lessons_map=lessons_map)['lessons']
+    else:
+        content = outline
+    content = course_page_context(course, content, mode)
+    # Перекрывает ленивый токен контекстного процессора csrf.
+    content['csrf_token'] = ''
+    page = render_to_string('course.html', content, _anonymous_request(course_id))
+    _write(os.path.join(target, 'index.html'), page)
+    return target
+
+
+def unpublish_course(course_id, root=None):
+    """Удаляет опубликованную копию курса."""
+    root = root or publish_root()
+    if root:
+        shutil.rmtree(course_dir(course_id, root), ignore_errors=True)
+
+
+@receiver(post_delete, sender=Courses)
+def unpublish_deleted_course(sender, instance, **kwargs):
+    """Удаляет опубликованную копию удалённого курса, в том числе удалённого каскадом."""
+    unpublish_course(instance.pk)
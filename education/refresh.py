@@ -0,0 +1,121 @@
+"""Обновление производных файлов курса после записи уроков.
+
+Производные файлы — артефакт урока (education.compiler), манифест
+(education.manifest), поисковый документ (education.search) и
+статическая копия (education.publish). Модуль стоит над ними всеми,
+поэтому им самим не нужно знать друг о друге.
+
+Запись уроков и обновление производных файлов идут под замком
+``build/save.lock`` (``saving``). Наблюдатель (education.watcher) берёт
+тот же замок, поэтому событие от только что сохранённого урока он
+разбирает уже после того, как сохранение закончилось, и пропускает его.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from education.atomic import file_lock
+from education.cache import cached_lesson_chain
+from education.compiler import BUILD_DIR, compile_lesson
+from education.manifest import update_manifest, update_manifest_tasks
+from education.publish import publish_course
+from education.search import index_course
+
+logger = logging.getLogger('app')
+
+SAVE_LOCK_NAME = 'save.lock'
+
+
+@contextmanager
+def saving(course_path):
+    """
+    Замок на запись уроков курса и обновление его производных файлов.
+
+    write_lesson берёт его сам; при записи нескольких уроков подряд
+    (write_lesson с refresh=False и refresh_course в конце) блок нужно
+    обернуть в saving целиком.
+
+    :param str course_path: Путь к папке курса
+    """
+    with file_lock(os.path.join(course_path, BUILD_DIR, SAVE_LOCK_NAME)):
+        yield
+
+
+def refresh_course(course_path, lesson_name=None, tasks_only=False):
+    """
+    Пересобирает производные файлы курса после изменения уроков:
+    манифест, поисковый документ и, если включена публикация,
+    статическую копию.
+
+    С lesson_name каждый шаг касается только этого урока: его записи в
+    манифесте, его текста в поисковом документе и его страниц в
+    статической копии (плюс страница курса, которая собирается из кэша
+    рендеринга). Остальные уроки заново не рендерятся и их текст заново не
+    извлекается.
+
+    :param str course_path: Путь к папке курса
+    :param lesson_name: Изменённый урок; None — курс целиком
+    :param bool tasks_only: Менялись только задачи — в манифесте обновляется
+                            лишь отметка задач, записи уроков не трогаются
+    """
+    try:
+        if tasks_only:
+            update_manifest_tasks(course_path)
+        else:
+            update_manifest(course_path, lesson_name)
+    except Exception as e:
+        logger.warning(f"Не удалось обновить манифест {course_path}: {e}")
+
+    course_id = os.path.basename(os.path.normpath(course_path))
+    if not course_id.isdigit():
+        return
+    try:
+        index_course(int(course_id), course_path, lesson_name)
+    except Exception as e:
+        logger.warning(f"Не удалось обновить поисковый индекс {course_path}: {e}")
+    if getattr(settings, 'COURSE_PUBLISH_ROOT', None):
+        try:
+            publish_course(int(course_id), lesson_name=lesson_name)
+        except Exception as e:
+            logger.warning(f"Не удалось опубликовать курс {course_path}: {e}")
+
+
+def write_lesson(course_path, lesson_name, chunks, refresh=True):
+    """
+    Записывает исходник урока и сразу компилирует его в HTML.
+
+    Перерендеривается только этот урок (и его задачи): свежий результат
+    сразу кладётся в кэш рендеринга, записи остальных уроков не трогаются,
+    а ревизия курса в манифесте увеличивается.
+
+    :param str course_path: Путь к папке курса
+    :param str lesson_name: Имя файла урока (lesson_N.md)
+    :param chunks: Итерируемое байтовых кусков содержимого
+    :param bool refresh: Пересобрать ли производные файлы курса (refresh_course)
+                         под замком saving; при записи нескольких уроков подряд удобно
+                         вызвать его один раз в конце, обернув всё в saving
+    :return: путь к записанному файлу
+    :rtype: str
+    """
+    if refresh:
+        with saving(course_path):
+            path = write_lesson(course_path, lesson_name, chunks, refresh=False)
+            refresh_course(course_path, lesson_name)
+        return path
+
+    path = os.path.join(course_path, lesson_name)
+    with open(path, 'wb') as dst:
+        for chunk in chunks:
+            dst.write(chunk)
+
+    try:
+        lesson = compile_lesson(path, lesson_name, course_path)
+        cached_lesson_chain.replace_lesson((path, lesson_name, course_path), lesson)
+    except Exception as e:
+        # Ошибку покажет страница курса, когда попробует отрендерить урок сама.
+        logger.warning(f"Не удалось скомпилировать {path}: {e}")
+    return path
+
@@ -0,0 +1,274 @@
+"""Полнотекстовый поиск по курсам.
+
+Для каждого курса хранится поисковый документ (``CourseSearchDocument``):
+название курса, названия уроков и текст отрендеренных уроков без
+разметки. Документ обновляется в ``refresh_course``, то есть при
+загрузке курса, сохранении урока и изменениях, найденных наблюдателем
+за медиа: текст каждого урока хранится отдельно (``lesson_texts``),
+поэтому после правки одного урока заново извлекается только его текст.
+Удаляется документ вместе с курсом (сигнал post_delete, то есть и при
+каскадном удалении, и при ``QuerySet.delete``).
+
+* PostgreSQL: столбец tsvector (название с весом A, текст с весом B) с
+  GIN-индексом, запрос ``websearch_to_tsquery``, ранжирование
+  ``ts_rank`` и фрагменты ``ts_headline``. Конфигурация текстового
+  поиска — настройка ``SEARCH_CONFIG`` (по умолчанию 'russian').
+* SQLite: таблица FTS5 с тем же содержимым, ранжирование ``bm25`` и
+  фрагменты ``snippet()``.
+* Прочие СУБД: ``icontains`` по документам без ранжирования.
+
+Результаты поиска по содержимому листаются смещением по рангу
+(``search_courses(text, limit, offset)``).
+
+Фильтры каталога по названию, автору и тегам (``filter_courses``) в
+PostgreSQL дополняются похожестью по триграммам; и подстрока, и
+похожесть идут по GIN-индексам pg_trgm на ``UPPER(...)`` (миграции
+education 0026 и authentication 0003).
+"""
+
+import os
+import re
+from html import unescape
+
+from django.conf import settings
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Upper
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+from authentication.models import User
+
+from education.files import get_lessons_map, render_lesson, resolve_lessons
+from education.layout import LESSON_RE, get_lesson_number
+from education.models import Courses, CourseSearchDocument, Lessons, Topic
+
+FTS_TABLE = 'education_coursesearch_fts'
+
+# Границы найденных слов во фрагменте; заменяются на <mark> после экранирования.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+
+def search_config():
+    """Конфигурация текстового поиска PostgreSQL."""
+    return getattr(settings, 'SEARCH_CONFIG', 'russian')
+
+
+def lesson_text(html):
+    """Текст урока без HTML-разметки."""
+    return re.sub(r'\s+', ' ', unescape(strip_tags(html))).strip()
+
+
+def lesson_entry(course_path, lesson_name, lesson=None):
+    """
+    Название и текст одного урока для поискового документа.
+
+    Урок берётся тем же путём, что и для страницы курса (кэш,
+    артефакты), так что после refresh_course повторного рендеринга нет.
+
+    :param lesson: Строка Lessons для этого урока или None
+    :return: [название, текст]
+    :rtype: list
+    """
+    rendered = render_lesson(course_path, lesson_name, lesson)
+    return [rendered['title'], lesson_text(rendered['content'])]
+
+
+def course_texts(course, course_path):
+    """Записи lesson_entry всех уроков курса: имя файла → [название, текст]."""
+    if not os.path.isdir(course_path):
+        return {}
+    lessons_map = get_lessons_map(course)
+    texts = {}
+    for lesson_name in resolve_lessons(course_path):
+        m = LESSON_RE.match(lesson_name)
+        texts[lesson_name] = lesson_entry(course_path, lesson_name, lessons_map.get(int(m.group(1))) if m else None)
+    return texts
+
+
+def course_body(texts):
+    """Текст документа: названия и тексты уроков по порядку одной строкой."""
+    return '\n'.join(part for name in sorted(texts, key=get_lesson_number) for part in texts[name])
+
+
+def index_course(course_id, course_path=None, lesson_name=None):
+    """
+    Обновляет поисковый документ курса.
+
+    :param int course_id: Идентификатор курса
+    :param course_path: Папка курса; по умолчанию MEDIA_ROOT/<course_id>
+    :param lesson_name: Изменённый урок: если документ уже есть, пересчитывается
+                        только запись этого урока; None — все уроки
+    :return: документ или None, если курса нет
+    :rtype: CourseSearchDocument | None
+    """
+    course = Courses.objects.filter(course_id=course_id).first()
+    if course is None:
+        remove_course(course_id)
+        return None
+    course_path = course_path or os.path.join(settings.MEDIA_ROOT, str(course_id))
+    document = CourseSearchDocument.objects.filter(pk=course_id).first()
+
+    if lesson_name is not None and document is not None and document.lesson_texts:
+        texts = dict(document.lesson_texts)
+        if os.path.isfile(os.path.join(course_path, lesson_name)):
+            m = LESSON_RE.match(lesson_name)
+            lesson = Lessons.objects.filter(course=course, order=int(m.group(1))).first() if m else None
+            texts[lesson_name] = lesson_entry(course_path, lesson_name, lesson)
+        else:
+            texts.pop(lesson_name, None)
+    else:
+        texts = course_texts(course, course_path)
+
+    with transaction.atomic():
+        document, _ = CourseSearchDocument.objects.update_or_create(
+            course=course,
+            defaults={'title': course.title, 'body': course_body(texts), 'lesson_texts': texts},
+        )
+        if connection.vendor == 'postgresql':
+            config = search_config()
+            CourseSearchDocument.objects.filter(pk=course_id).update(
+                vector=SearchVector('title', weight='A', config=config) + SearchVector('body', weight='B', config=config)
+            )
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [course_id])
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+                    [course_id, document.title, document.body]
+                )
+    return document
+
+
+def remove_course(course_id):
+    """Удаляет курс из поискового индекса."""
+    CourseSearchDocument.objects.filter(pk=course_id).delete()
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [course_id])
+
+
+@receiver(post_delete, sender=Courses)
+def remove_deleted_course(sender, instance, **kwargs):
+    """Убирает из индекса удалённый курс, в том числе удалённый каскадом."""
+    remove_course(instance.pk)
+
+
+def format_snippet(raw):
+    """Экранирует фрагмент и выделяет найденные слова тегом <mark>."""
+    html = escape(raw).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+def fts5_query(text):
+    """
+    Запрос пользователя в синтаксисе FTS5: все слова, каждое как префикс.
+
+    Слова берутся в кавычки, так что операторы FTS5 в запросе не работают
+    и не ломают его.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def _search_postgresql(text, limit, offset):
+    config = search_config()
+    query = SearchQuery(text, config=config, search_type='websearch')
+    documents = CourseSearchDocument.objects.filter(vector=query).annotate(
+        rank=SearchRank(F('vector'), query),
+        snippet=SearchHeadline(
+            'body', query, config=config,
+            start_sel=MARK_START, stop_sel=MARK_END, max_words=30, min_words=10,
+        ),
+    ).order_by('-rank', 'course_id').values_list('course_id', 'rank', 'snippet')[offset:offset + limit]
+    return list(documents)
+
+
+def _search_sqlite(text, limit, offset):
+    match = fts5_query(text)
+    if not match:
+        return []
+    # Строки FTS5 не связаны внешним ключом с курсом: сверка с документами
+    # не даёт осиротевшим строкам занимать места в LIMIT.
+    documents = CourseSearchDocument._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, -bm25({FTS_TABLE}, 10.0, 1.0), '
+            f"snippet({FTS_TABLE}, -1, %s, %s, '…', 24) "
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid IN (SELECT course_id FROM {documents}) '
+            f'ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), rowid LIMIT %s OFFSET %s',
+            [MARK_START, MARK_END, match, limit, offset]
+        )
+        return cursor.fetchall()
+
+
+def _search_fallback(text, limit, offset):
+    documents = CourseSearchDocument.objects.filter(
+        Q(title__icontains=text) | Q(body__icontains=text)
+    ).order_by('course_id').values_list('course_id', 'body')[offset:offset + limit]
+    return [(course_id, 0.0, body[:200]) for course_id, body in documents]
+
+
+def search_courses(text, limit=20, offset=0):
+    """
+    Ранжированный поиск курсов по названию и содержимому уроков.
+
+    :param str text: Запрос пользователя
+    :param int limit: Сколько результатов вернуть
+    :param int offset: Сколько лучших результатов пропустить (следующие страницы)
+    :return: список {'course_id', 'rank', 'snippet'} от лучшего к худшему;
+             snippet — безопасный HTML с <mark> вокруг найденных слов
+    :rtype: list
+    """
+    search = {
+        'postgresql': _search_postgresql,
+        'sqlite': _search_sqlite,
+    }.get(connection.vendor, _search_fallback)
+    return [
+        {'course_id': course_id, 'rank': rank, 'snippet': format_snippet(snippet or '')}
+        for course_id, rank, snippet in search(text, limit, offset)
+    ]
+
+
+def substring_condition(field, text):
+    """
+    Условие «поле содержит text» без учёта регистра.
+
+    В PostgreSQL к подстроке добавляется похожесть по триграммам (опечатки,
+    другие окончания); оба условия строятся по выражению UPPER(field),
+    на котором стоит GIN-индекс pg_trgm.
+
+    :param str field: Имя поля модели
+    :param str text: Искомый текст
+    :rtype: Q
+    """
+    condition = Q(**{f'{field}__icontains': text})
+    if connection.vendor == 'postgresql':
+        condition |= TrigramSimilar(Upper(field), text.upper())
+    return condition
+
+
+def filter_courses(qs, filter_by, text):
+    """
+    Фильтр каталога курсов по названию, автору или тегу.
+
+    Автор и теги ищутся подзапросом по своей таблице (и её индексу), а не
+    через JOIN, поэтому DISTINCT не нужен.
+
+    :param qs: QuerySet курсов
+    :param str filter_by: 'title', 'author' или 'tags'
+    :param str text: Искомый текст
+    :return: отфильтрованный QuerySet (qs без изменений для неизвестного filter_by)
+    """
+    if filter_by == 'title':
+        return qs.filter(substring_condition('title', text))
+    if filter_by == 'author':
+        return qs.filter(author__in=User.objects.filter(substring_condition('username', text)).values('pk'))
+    if filter_by == 'tags':
+        return qs.filter(course_id__in=Topic.objects.filter(substring_condition('name', text)).values('courses'))
+    return qs
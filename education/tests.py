@@ -1,17 +1,89 @@
+import asyncio
+import gzip
+import json
 import os
 import shutil
 import tempfile
+import threading
+from io import StringIO
+from unittest import mock, skipUnless
+
+import markdown
+from markdown.extensions.codehilite import CodeHiliteExtension
 from django.forms import formset_factory
-from django.test import TestCase, Client, override_settings
+from django.test import TestCase, AsyncClient, Client, override_settings
 from django.urls import reverse
 from authentication.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.http import QueryDict
 from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from education.models import Courses, Lessons, Stars, ReportCourse, Topic, CourseProgress
 from education.forms import AddCourseForm, AddLessonForm
+from education.methods import get_metadata, get_most_popular_courses, read_metadata, reconcile_counters
+from education.chain import TaskHandler, get_task_index, lesson_chain
+from education.aio import get_all_lessons_async
+from education.files import get_all_lessons, render_lesson
+from education.refresh import refresh_course, write_lesson
+from education.benchmark import compare_results
+from education.compression import choose_encoding
+from education.instrumentation import StageStats, stage_stats
+from education.publish import course_dir
+from education.search import filter_courses, search_courses
+from education.watcher import PollingBackend, acquire_lock, apply_changes, classify
+from education.manifest import course_version, get_manifest, read_manifest, update_manifest
+from education.cache import LessonRenderCache, cached_lesson_chain
+from education.parallel import prerender_lessons, shutdown_executor
+from education.markup import (
+    MARKDOWN_EXTENSIONS, CodeBlockCache, code_block_cache, get_markdown, render_markdown
+)
+from education.compiler import artifact_path, compile_lesson, load_artifact, source_fingerprint
 
 TEST_MEDIA_ROOT = tempfile.mkdtemp()
+TEST_PUBLISH_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class CourseFilesTestCase(TestCase):
+    """
+    Общая подготовка тестов с файлами курса: пользователь, его курс и
+    папка курса (с tasks/) во временном MEDIA_ROOT. Временные MEDIA_ROOT и
+    TEST_PUBLISH_ROOT (для подклассов с COURSE_PUBLISH_ROOT) удаляются
+    после каждого теста.
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.course = Courses.objects.create(title='Test Course', author=self.user)
+        self.course_path = os.path.join(settings.MEDIA_ROOT, str(self.course.course_id))
+        os.makedirs(os.path.join(self.course_path, 'tasks'), exist_ok=True)
+
+    def write_lesson_file(self, idx, text):
+        """Пишет файл lesson_<idx>.md курса."""
+        with open(os.path.join(self.course_path, f'lesson_{idx}.md'), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def add_lesson(self, idx, text, title=None):
+        """Создаёт урок курса: строку Lessons (по умолчанию 'Lesson <idx>') и его файл."""
+        lesson = Lessons.objects.create(course=self.course, title=title or f'Lesson {idx}', order=idx)
+        self.write_lesson_file(idx, text)
+        return lesson
+
+    def add_lessons(self, count, text='Урок **{}**'):
+        """Создаёт уроки 0..count-1 с текстом по шаблону."""
+        return [self.add_lesson(idx, text.format(idx)) for idx in range(count)]
+
+    def tearDown(self):
+        for root in (TEST_MEDIA_ROOT, TEST_PUBLISH_ROOT):
+            if os.path.exists(root):
+                shutil.rmtree(root)
 
 
 class AllCoursesViewTest(TestCase):
@@ -44,6 +116,20 @@ class AllCoursesViewTest(TestCase):
         response = self.client.get(reverse('all'))
         self.assertTrue(response.context['courses'][0]['is_stared'])
 
+    def test_constant_query_count(self):
+        self.client.login(email='test@example.com', password='testpass123')
+        self.client.get(reverse('all'))
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('all'))
+        for idx in range(10):
+            course = Courses.objects.create(title=f'Course {idx}', author=self.user)
+            if idx % 2:
+                Stars.objects.create(user=self.user, course=course)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('all'))
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(sum(c['is_stared'] for c in response.context['courses']), 5)
+
 
 class StaredCoursesViewTest(TestCase):
     """Тесты для представления избранных курсов"""
@@ -76,6 +162,13 @@ class StaredCoursesViewTest(TestCase):
         response = self.client.get(reverse('stared'))
         self.assertIsNotNone(response.context['popular_courses'])
 
+    def test_page_past_the_end_is_not_empty_state(self):
+        self.client.login(email='test@example.com', password='testpass123')
+        response = self.client.get(reverse('stared'), {'after': self.course.course_id})
+        self.assertEqual(response.context['courses'], [])
+        self.assertIsNone(response.context['popular_courses'])
+        self.assertNotContains(response, 'Вы ещё не добавили')
+
 
 class MyCoursesViewTest(TestCase):
     """Тесты для представления личных курсов пользователя"""
@@ -360,3 +453,1250 @@ class TopicManagementTest(TestCase):
             {'name': 'Existing Topic'}
         )
         self.assertEqual(response.json()['status'], 'error')
+
+
+class CountingChain:
+    """Обёртка над цепочкой, считающая реальные рендеры."""
+
+    def __init__(self, chain):
+        self.chain = chain
+        self.calls = 0
+
+    def handle(self, data):
+        self.calls += 1
+        return self.chain.handle(data)
+
+
+class LessonRenderCacheTest(TestCase):
+    """Тесты для кэша отрендеренных уроков"""
+
+    def setUp(self):
+        self.course_path = tempfile.mkdtemp()
+        self.lesson_path = os.path.join(self.course_path, 'lesson_0.md')
+        with open(self.lesson_path, 'w', encoding='utf-8') as f:
+            f.write('# Заголовок\n\n```python\nprint(1)\n```\n')
+        self.chain = CountingChain(lesson_chain)
+        self.cache = LessonRenderCache(self.chain, hot_size=16)
+        self.cache.backend.clear()
+        self.data = (self.lesson_path, 'lesson_0.md', self.course_path)
+
+    def test_second_render_is_cached(self):
+        first = self.cache.handle(self.data)
+        second = self.cache.handle(self.data)
+        self.assertEqual(self.chain.calls, 1)
+        self.assertEqual(first, second)
+        self.assertIn('codehilite', second['content'])
+
+    def test_change_invalidates(self):
+        self.cache.handle(self.data)
+        with open(self.lesson_path, 'w', encoding='utf-8') as f:
+            f.write('Новый текст урока')
+        result = self.cache.handle(self.data)
+        self.assertEqual(self.chain.calls, 2)
+        self.assertIn('Новый текст урока', result['content'])
+
+    def test_django_tier_survives_hot_tier_clear(self):
+        self.cache.handle(self.data)
+        self.cache.clear()
+        self.cache.handle(self.data)
+        self.assertEqual(self.chain.calls, 1)
+
+    def test_result_is_copied(self):
+        self.cache.handle(self.data)['title'] = 'changed'
+        self.assertNotEqual(self.cache.handle(self.data)['title'], 'changed')
+
+    def tearDown(self):
+        shutil.rmtree(self.course_path)
+
+
+class LessonCompilerTest(CourseFilesTestCase):
+    """Тесты для компиляции уроков при записи"""
+
+    def setUp(self):
+        super().setUp()
+        self.add_lesson(0, 'Old content', title='Lesson 1')
+        self.lesson_path = os.path.join(self.course_path, 'lesson_0.md')
+
+    def test_editor_save_writes_artifact(self):
+        self.client.login(email='test@example.com', password='testpass123')
+        self.client.post(
+            reverse('course_edit', args=[self.course.course_id]),
+            {'lesson': '0', 'content': 'New **content**'}
+        )
+        lesson = load_artifact(self.lesson_path, 'lesson_0.md', self.course_path)
+        self.assertIn('<strong>content</strong>', lesson['content'])
+
+    def test_stale_artifact_is_ignored(self):
+        compile_lesson(self.lesson_path, 'lesson_0.md', self.course_path)
+        with open(self.lesson_path, 'w', encoding='utf-8') as f:
+            f.write('Changed outside of the editor')
+        self.assertIsNone(load_artifact(self.lesson_path, 'lesson_0.md', self.course_path))
+
+    def test_backfill_command(self):
+        call_command('compile_lessons', self.course.course_id, stdout=StringIO())
+        self.assertTrue(os.path.isfile(artifact_path(self.course_path, 'lesson_0.md')))
+
+    def test_build_dir_is_not_a_lesson(self):
+        compile_lesson(self.lesson_path, 'lesson_0.md', self.course_path)
+        response = self.client.get(reverse('course', args=[self.course.course_id]))
+        self.assertEqual(len(response.context['lessons']), 1)
+
+    def test_concurrent_compiles_from_threads(self):
+        errors = []
+
+        def compile_once():
+            try:
+                compile_lesson(self.lesson_path, 'lesson_0.md', self.course_path)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=compile_once) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertIsNotNone(load_artifact(self.lesson_path, 'lesson_0.md', self.course_path))
+        build_dir = os.path.dirname(artifact_path(self.course_path, 'lesson_0.md'))
+        self.assertEqual([name for name in os.listdir(build_dir) if name.endswith('.tmp')], [])
+
+
+class TaskIndexTest(TestCase):
+    """Тесты для индекса задач курса"""
+
+    LESSONS = 300
+    TASKS = 3000
+
+    def setUp(self):
+        self.course_path = tempfile.mkdtemp()
+        self.tasks_dir = os.path.join(self.course_path, 'tasks')
+        os.makedirs(self.tasks_dir)
+        for task_id in range(self.TASKS):
+            name = f'{task_id}_tusk_lesson_{task_id % self.LESSONS}.md'
+            with open(os.path.join(self.tasks_dir, name), 'w', encoding='utf-8') as f:
+                f.write(f'[metadata]\nright_answer: {task_id}\n[/metadata]\nЗадача {task_id}')
+
+    def test_directory_scanned_once_per_course(self):
+        handler = TaskHandler()
+        with mock.patch('education.chain.os.listdir', wraps=os.listdir) as listdir:
+            for lesson in range(self.LESSONS):
+                ctx = handler.process({
+                    'course_path': self.course_path,
+                    'lesson_name': f'lesson_{lesson}.md',
+                })
+                self.assertEqual(len(ctx['tasks']), self.TASKS // self.LESSONS)
+        scans = [c for c in listdir.call_args_list if c.args == (self.tasks_dir,)]
+        self.assertEqual(len(scans), 1)
+
+    def test_tasks_are_ordered_and_parsed(self):
+        ctx = TaskHandler().process({'course_path': self.course_path, 'lesson_name': 'lesson_7.md'})
+        self.assertEqual([t['task_id'] for t in ctx['tasks']][:3], ['7', '307', '607'])
+        self.assertEqual(ctx['tasks'][0]['right_answer'], '7')
+
+    def test_index_rebuilt_when_directory_changes(self):
+        self.assertNotIn(self.LESSONS + 1, get_task_index(self.course_path))
+        name = f'{self.TASKS}_tusk_lesson_{self.LESSONS + 1}.md'
+        with open(os.path.join(self.tasks_dir, name), 'w', encoding='utf-8') as f:
+            f.write('Новая задача')
+        os.utime(self.tasks_dir, ns=(0, os.stat(self.tasks_dir).st_mtime_ns + 1))
+        self.assertIn(self.LESSONS + 1, get_task_index(self.course_path))
+
+    def tearDown(self):
+        shutil.rmtree(self.course_path)
+
+
+class MarkdownEngineTest(TestCase):
+    """Тесты для пула экземпляров Markdown"""
+
+    def test_output_matches_markdown(self):
+        text = '# Заголовок\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\n```python\nprint(1)\n```\n'
+        for _ in range(2):
+            self.assertEqual(
+                render_markdown(text),
+                markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+            )
+
+    def test_state_is_reset_between_documents(self):
+        render_markdown('```python\nx = 1\n```\n')
+        self.assertNotIn('codehilite', render_markdown('просто текст'))
+
+    def test_engine_is_per_thread(self):
+        engines = []
+        thread = threading.Thread(target=lambda: engines.append(get_markdown()))
+        thread.start()
+        thread.join()
+        self.assertIs(get_markdown(), get_markdown())
+        self.assertIsNot(engines[0], get_markdown())
+
+
+class CodeBlockCacheTest(TestCase):
+    """Тесты для кэша подсвеченных блоков кода"""
+
+    SNIPPET = '```python\nfor i in range(3):\n    print(i)\n```\n'
+
+    def setUp(self):
+        code_block_cache.clear()
+
+    def test_identical_blocks_highlighted_once(self):
+        first = render_markdown('Урок\n\n' + self.SNIPPET)
+        second = render_markdown('Задача\n\n' + self.SNIPPET + '\n' + self.SNIPPET)
+        stats = code_block_cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(first, markdown.markdown('Урок\n\n' + self.SNIPPET, extensions=MARKDOWN_EXTENSIONS))
+        self.assertEqual(second.count('class="codehilite"'), 2)
+
+    def test_blocks_with_attributes_fall_back(self):
+        text = '```python hl_lines="1"\nx = 1\n```\n'
+        self.assertEqual(render_markdown(text), markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS))
+        self.assertEqual(code_block_cache.stats()['misses'], 0)
+
+    def test_memory_is_bounded(self):
+        cache = CodeBlockCache(max_bytes=2000)
+        config = CodeHiliteExtension().getConfigs()
+        for i in range(50):
+            cache.highlight(f'x = {i}\n', 'python', config)
+        self.assertLessEqual(cache.stats()['bytes'], 2000)
+        self.assertLess(cache.stats()['entries'], 50)
+
+
+class LessonViewTest(CourseFilesTestCase):
+    """Тесты для подгрузки уроков по одному"""
+
+    def setUp(self):
+        super().setUp()
+        self.lesson = self.add_lesson(0, 'Текст урока **0**', title='Первый урок')
+        for idx in (1, 2):
+            self.write_lesson_file(idx, f'Текст урока **{idx}**')
+
+    def test_course_page_is_outline_only(self):
+        response = self.client.get(reverse('course', args=[self.course.course_id]))
+        lessons = response.context['lessons']
+        self.assertEqual([lesson['order'] for lesson in lessons], [0, 1, 2])
+        self.assertEqual(lessons[0]['title'], 'Первый урок')
+        self.assertEqual(lessons[0]['lesson_id'], self.lesson.lesson_id)
+        self.assertNotIn('content', lessons[0])
+        self.assertNotContains(response, '<strong>0</strong>')
+
+    def test_outline_title_from_metadata(self):
+        with open(os.path.join(self.course_path, 'lesson_1.md'), 'w', encoding='utf-8') as f:
+            f.write('---\ntitle: Из метаданных\n---\nТекст')
+        response = self.client.get(reverse('course', args=[self.course.course_id]))
+        self.assertEqual(response.context['lessons'][1]['title'], 'Из метаданных')
+        self.assertEqual(response.context['lessons'][2]['title'], 'Урок 2')
+
+    @override_settings(COURSE_PAGE_MODE='full')
+    def test_full_mode_renders_everything(self):
+        response = self.client.get(reverse('course', args=[self.course.course_id]))
+        self.assertContains(response, '<strong>2</strong>')
+
+    @override_settings(COURSE_PAGE_MODE='stream')
+    def test_stream_mode(self):
+        response = self.client.get(reverse('course', args=[self.course.course_id]))
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode('utf-8') for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 5)
+        self.assertIn('lessons-list', chunks[0])
+        self.assertNotIn('<strong>', chunks[0])
+        for idx in range(3):
+            self.assertIn(f'<strong>{idx}</strong>', chunks[idx + 1])
+        self.assertIn('</html>', chunks[-1])
+
+    def test_lesson_json(self):
+        response = self.client.get(reverse('lesson', args=[self.course.course_id, 0]))
+        lesson = response.json()['lesson']
+        self.assertEqual(lesson['title'], 'Первый урок')
+        self.assertEqual(lesson['lesson_id'], self.lesson.lesson_id)
+        self.assertIn('<strong>0</strong>', lesson['content'])
+
+    def test_lesson_html_fragment(self):
+        response = self.client.get(
+            reverse('lesson', args=[self.course.course_id, 1]), {'format': 'html'}
+        )
+        self.assertTemplateUsed(response, 'lesson_fragment.html')
+        self.assertContains(response, '<strong>1</strong>')
+
+    def test_missing_lesson(self):
+        response = self.client.get(reverse('lesson', args=[self.course.course_id, 9]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, COURSE_PAGE_MODE='full')
+class CoursePageQueryCountTest(TestCase):
+    """Число запросов страницы курса не зависит от числа уроков"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+
+    def make_course(self, lessons):
+        course = Courses.objects.create(title=f'Course {lessons}', author=self.user)
+        course_path = os.path.join(settings.MEDIA_ROOT, str(course.course_id))
+        os.makedirs(course_path, exist_ok=True)
+        for idx in range(lessons):
+            Lessons.objects.create(course=course, title=f'Lesson {idx}', order=idx)
+            with open(os.path.join(course_path, f'lesson_{idx}.md'), 'w', encoding='utf-8') as f:
+                f.write(f'Урок {idx}')
+        return course
+
+    def count_queries(self, course):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('course', args=[course.course_id]))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_constant_query_count(self):
+        small = self.count_queries(self.make_course(2))
+        large = self.count_queries(self.make_course(20))
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 2)
+
+    def tearDown(self):
+        if os.path.exists(TEST_MEDIA_ROOT):
+            shutil.rmtree(TEST_MEDIA_ROOT)
+
+
+class ParallelRenderTest(TestCase):
+    """Тесты для параллельного рендеринга уроков"""
+
+    def setUp(self):
+        self.course_path = tempfile.mkdtemp()
+        self.lessons = [f'lesson_{idx}.md' for idx in range(6)]
+        for idx, name in enumerate(self.lessons):
+            with open(os.path.join(self.course_path, name), 'w', encoding='utf-8') as f:
+                f.write(f'# Урок {idx}\n\n```python\nprint({idx})\n```\n')
+        cached_lesson_chain.clear()
+        cached_lesson_chain.backend.clear()
+
+    def render_sequentially(self):
+        return [
+            lesson_chain.handle((os.path.join(self.course_path, name), name, self.course_path))
+            for name in self.lessons
+        ]
+
+    def prerendered(self):
+        return [
+            cached_lesson_chain.handle((os.path.join(self.course_path, name), name, self.course_path))
+            for name in self.lessons
+        ]
+
+    @override_settings(LESSON_RENDER_WORKERS=0)
+    def test_disabled_by_default(self):
+        self.assertEqual(prerender_lessons(self.course_path, self.lessons), 0)
+
+    @override_settings(LESSON_RENDER_WORKERS=3, LESSON_RENDER_EXECUTOR='thread')
+    def test_thread_pool(self):
+        self.assertEqual(prerender_lessons(self.course_path, self.lessons), 6)
+        self.assertEqual(self.prerendered(), self.render_sequentially())
+        self.assertEqual(prerender_lessons(self.course_path, self.lessons), 0)
+
+    @override_settings(LESSON_RENDER_WORKERS=2, LESSON_RENDER_EXECUTOR='process')
+    def test_process_pool(self):
+        self.assertEqual(prerender_lessons(self.course_path, self.lessons), 6)
+        self.assertEqual(self.prerendered(), self.render_sequentially())
+
+    def tearDown(self):
+        shutdown_executor()
+        shutil.rmtree(self.course_path)
+
+
+class MetadataParserTest(TestCase):
+    """Тесты для разбора метаданных урока"""
+
+    def test_metadata_block(self):
+        meta, body = get_metadata('[metadata]\ntitle: Урок: введение\nright_answer: 42\n[/metadata]\n\n# Текст')
+        self.assertEqual(meta, {'title': 'Урок: введение', 'right_answer': '42'})
+        self.assertEqual(body, '# Текст')
+
+    def test_yaml_front_matter(self):
+        meta, body = get_metadata('---\ntitle: Циклы\nright_answer: 7\ntags: [python]\n---\nТело')
+        self.assertEqual(meta['title'], 'Циклы')
+        self.assertEqual(meta['right_answer'], '7')
+        self.assertEqual(meta['tags'], ['python'])
+        self.assertEqual(body, 'Тело')
+
+    def test_malformed_lines_are_skipped(self):
+        meta, _ = get_metadata('[metadata]\nбез двоеточия\nkey:value\n[/metadata]\nТело')
+        self.assertEqual(meta, {'key': 'value'})
+
+    def test_only_head_is_inspected(self):
+        text = '# Урок\n\n```\n[metadata]\nx: 1\n[/metadata]\n```\n'
+        self.assertEqual(get_metadata(text), ({}, text))
+
+    def test_unclosed_block(self):
+        text = '[metadata]\ntitle: x\n'
+        self.assertEqual(get_metadata(text), ({}, text))
+
+    def test_read_metadata_reads_head_only_once_per_version(self):
+        fd, path = tempfile.mkstemp(suffix='.md')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write('[metadata]\ntitle: Заголовок\n[/metadata]\n' + 'текст\n' * 5000)
+        try:
+            self.assertEqual(read_metadata(path), {'title': 'Заголовок'})
+            with mock.patch('builtins.open', side_effect=AssertionError('file re-read')):
+                self.assertEqual(read_metadata(path), {'title': 'Заголовок'})
+        finally:
+            os.remove(path)
+
+
+@override_settings(COURSE_PAGE_MODE='full')
+class CoursePageCacheTest(CourseFilesTestCase):
+    """Тесты для пути страницы курса через кэш рендеринга"""
+
+    def setUp(self):
+        super().setUp()
+        self.add_lessons(3)
+        with open(os.path.join(self.course_path, 'tasks', '1_tusk_lesson_0.md'), 'w', encoding='utf-8') as f:
+            f.write('Задача')
+        refresh_course(self.course_path)
+
+    def test_warm_page_is_served_from_render_cache(self):
+        self.client.get(reverse('course', args=[self.course.course_id]))
+        with mock.patch('education.compiler.load_artifact') as load, \
+                mock.patch.object(lesson_chain, 'handle') as handle:
+            response = self.client.get(reverse('course', args=[self.course.course_id]))
+        load.assert_not_called()
+        handle.assert_not_called()
+        self.assertContains(response, '<strong>2</strong>')
+        self.assertEqual(len(response.context['lessons'][0]['tasks']), 1)
+
+    def test_edited_lesson_is_rerendered(self):
+        self.client.get(reverse('course', args=[self.course.course_id]))
+        with open(os.path.join(self.course_path, 'lesson_1.md'), 'w', encoding='utf-8') as f:
+            f.write('Исправленный _урок_')
+        response = self.client.get(reverse('course', args=[self.course.course_id]))
+        self.assertContains(response, '<em>урок</em>')
+
+
+class CourseManifestTest(CourseFilesTestCase):
+    """Тесты для манифеста курса"""
+
+    def setUp(self):
+        super().setUp()
+        for idx in (0, 2, 10):
+            self.add_lesson(idx, f'Урок {idx}')
+
+    def test_manifest_built_once_then_read(self):
+        self.client.get(reverse('course', args=[self.course.course_id]))
+        manifest = read_manifest(self.course_path)
+        self.assertEqual([e['name'] for e in manifest['lessons']], ['lesson_0.md', 'lesson_2.md', 'lesson_10.md'])
+        with mock.patch('education.files.os.listdir') as listdir:
+            response = self.client.get(reverse('course', args=[self.course.course_id]))
+        listdir.assert_not_called()
+        self.assertEqual(len(response.context['lessons']), 3)
+
+    def test_editor_save_updates_entry(self):
+        before = get_manifest(self.course_path)
+        self.client.login(email='test@example.com', password='testpass123')
+        self.client.post(
+            reverse('course_edit', args=[self.course.course_id]),
+            {'lesson': '2', 'content': 'Другой текст'}
+        )
+        after = read_manifest(self.course_path)
+        self.assertNotEqual(before['hash'], after['hash'])
+        changed = [a['name'] for a, b in zip(after['lessons'], before['lessons']) if a['sha1'] != b['sha1']]
+        self.assertEqual(changed, ['lesson_2.md'])
+
+    def test_deleted_lesson_is_dropped(self):
+        get_manifest(self.course_path)
+        os.remove(os.path.join(self.course_path, 'lesson_2.md'))
+        manifest = update_manifest(self.course_path, 'lesson_2.md')
+        self.assertEqual([e['order'] for e in manifest['lessons']], [0, 10])
+
+    def test_changes_outside_write_paths_rebuild_manifest(self):
+        before = get_manifest(self.course_path)
+        with open(os.path.join(self.course_path, 'lesson_2.md'), 'w', encoding='utf-8') as f:
+            f.write('Правка в обход редактора')
+        edited = get_manifest(self.course_path)
+        self.assertGreater(edited['revision'], before['revision'])
+        self.assertNotEqual(edited['hash'], before['hash'])
+
+        with open(os.path.join(self.course_path, 'lesson_5.md'), 'w', encoding='utf-8') as f:
+            f.write('Новый урок')
+        self.assertEqual([e['order'] for e in get_manifest(self.course_path)['lessons']], [0, 2, 5, 10])
+        self.assertEqual(get_manifest(self.course_path)['revision'], edited['revision'] + 1)
+
+    def test_concurrent_updates_keep_every_lesson(self):
+        get_manifest(self.course_path)
+        names = [f'lesson_{idx}.md' for idx in range(20, 28)]
+        for name in names:
+            with open(os.path.join(self.course_path, name), 'w', encoding='utf-8') as f:
+                f.write(name)
+        threads = [threading.Thread(target=update_manifest, args=(self.course_path, name)) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        manifest = read_manifest(self.course_path)
+        self.assertEqual(len(manifest['lessons']), 3 + len(names))
+        self.assertEqual(manifest['revision'], 1 + len(names))
+
+
+class ConditionalGetTest(CourseFilesTestCase):
+    """Тесты для условных GET-запросов"""
+
+    def setUp(self):
+        super().setUp()
+        self.lesson = self.add_lesson(0, 'Урок')
+
+    def test_course_page_not_modified(self):
+        url = reverse('course', args=[self.course.course_id])
+        # Первый ответ выставляет CSRF-cookie, от которой тоже зависит ETag.
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+
+        with mock.patch('education.views.resolve_lessons') as resolve:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        resolve.assert_not_called()
+
+    def test_course_etag_changes_after_edit(self):
+        url = reverse('course', args=[self.course.course_id])
+        self.client.login(email='test@example.com', password='testpass123')
+        etag = self.client.get(url)['ETag']
+        self.client.post(
+            reverse('course_edit', args=[self.course.course_id]),
+            {'lesson': '0', 'content': 'Новый текст'}
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_course_title_change_is_not_hidden_by_if_modified_since(self):
+        url = reverse('course', args=[self.course.course_id])
+        self.client.get(url)
+        Courses.objects.filter(pk=self.course.pk).update(title='Новое название')
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertContains(response, 'Новое название')
+
+    def test_course_etag_depends_on_user(self):
+        url = reverse('course', args=[self.course.course_id])
+        anonymous = self.client.get(url)['ETag']
+        self.client.login(email='test@example.com', password='testpass123')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=anonymous).status_code, 200)
+
+    def test_progress_etag_changes_on_toggle(self):
+        self.client.login(email='test@example.com', password='testpass123')
+        url = reverse('progress', args=[self.course.course_id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(reverse('lesson_progress', args=[self.course.course_id, self.lesson.pk]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['done_lessons'], [self.lesson.pk])
+
+    def test_progress_etag_changes_when_done_lesson_swaps(self):
+        other = Lessons.objects.create(course=self.course, title='Lesson 1', order=1)
+        CourseProgress.objects.create(user=self.user, lesson=self.lesson, status=True)
+        CourseProgress.objects.create(user=self.user, lesson=other, status=False)
+        self.client.login(email='test@example.com', password='testpass123')
+        url = reverse('progress', args=[self.course.course_id])
+        etag = self.client.get(url)['ETag']
+
+        for lesson in (self.lesson, other):
+            self.client.post(reverse('lesson_progress', args=[self.course.course_id, lesson.pk]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['done_lessons'], [other.pk])
+
+    def test_topics_not_modified(self):
+        self.client.login(email='test@example.com', password='testpass123')
+        Topic.objects.create(name='Python', author=self.user)
+        etag = self.client.get(reverse('get_topics'))['ETag']
+        self.assertEqual(self.client.get(reverse('get_topics'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Topic.objects.create(name='Django', author=self.user)
+        self.assertEqual(self.client.get(reverse('get_topics'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(COURSE_PAGE_MODE='full')
+class IncrementalInvalidationTest(CourseFilesTestCase):
+    """Правка одного урока перерендеривает только его"""
+
+    def setUp(self):
+        super().setUp()
+        self.add_lessons(3)
+        cached_lesson_chain.clear()
+        cached_lesson_chain.backend.clear()
+        self.client.login(email='test@example.com', password='testpass123')
+
+    def test_edit_rerenders_single_lesson(self):
+        self.client.get(reverse('course', args=[self.course.course_id]))
+        version = course_version(self.course_path)
+
+        with mock.patch.object(lesson_chain, 'handle', wraps=lesson_chain.handle) as handle:
+            self.client.post(
+                reverse('course_edit', args=[self.course.course_id]),
+                {'lesson': '1', 'content': 'Новый **текст**'}
+            )
+            response = self.client.get(reverse('course', args=[self.course.course_id]))
+
+        self.assertEqual([c.args[0][1] for c in handle.call_args_list], ['lesson_1.md'])
+        self.assertContains(response, 'Новый <strong>текст</strong>')
+        self.assertEqual(course_version(self.course_path), version + 1)
+
+    def test_task_change_touches_only_its_lesson(self):
+        paths = [os.path.join(self.course_path, f'lesson_{idx}.md') for idx in range(3)]
+        before = [source_fingerprint(path, self.course_path) for path in paths]
+        with open(os.path.join(self.course_path, 'tasks', '1_tusk_lesson_2.md'), 'w', encoding='utf-8') as f:
+            f.write('Задача')
+        after = [source_fingerprint(path, self.course_path) for path in paths]
+        self.assertEqual(before[:2], after[:2])
+        self.assertNotEqual(before[2], after[2])
+
+
+class BenchmarkCommandTest(TestCase):
+    """Тесты для бенчмарка конвейера рендеринга"""
+
+    def test_json_results(self):
+        out = StringIO()
+        call_command(
+            'benchmark_lessons', '--in-place', '--lessons', '3',
+            '--lesson-size', '300', '--repeat', '1', stdout=out
+        )
+        results = json.loads(out.getvalue())
+        labels = [result['label'] for result in results['results']]
+        self.assertEqual(labels, [os.path.join('media', '49'), 'synthetic-3'])
+
+        synthetic = results['results'][1]
+        self.assertEqual(synthetic['lessons'], 3)
+        self.assertEqual(
+            set(synthetic['stages']),
+            {'ReadFileHandler', 'MetadataHandler', 'MarkdownHandler', 'TaskHandler', 'BuildResultHandler'}
+        )
+        self.assertEqual(set(synthetic['view']), {'lazy', 'full', 'stream'})
+        self.assertFalse(Courses.objects.exists())
+
+        rows = compare_results(results, results)
+        self.assertTrue(rows)
+        self.assertTrue(all(ratio in (1.0, None) for _, _, _, ratio in rows))
+
+
+TEST_FLAG_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(LESSON_STAGE_STATS_FLAG=os.path.join(TEST_FLAG_ROOT, 'stage-stats'))
+class StageStatsTest(TestCase):
+    """Тесты для замеров этапов цепочки рендеринга"""
+
+    def setUp(self):
+        self.client = Client()
+        self.staff = User.objects.create_user(
+            email='staff@example.com',
+            username='staff',
+            password='testpass123',
+            is_staff=True
+        )
+        User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.course_path = tempfile.mkdtemp()
+        self.lesson_path = os.path.join(self.course_path, 'lesson_0.md')
+        with open(self.lesson_path, 'w', encoding='utf-8') as f:
+            f.write('# Урок\n\n```python\nprint(1)\n```\n')
+        self.data = (self.lesson_path, 'lesson_0.md', self.course_path)
+        code_block_cache.clear()
+        stage_stats.reset()
+
+    def test_disabled_records_nothing(self):
+        stage_stats.set_enabled(False)
+        lesson_chain.handle(self.data)
+        self.assertEqual(stage_stats.snapshot(), {})
+
+    def test_records_each_stage(self):
+        stage_stats.set_enabled(True)
+        lesson_chain.handle(self.data)
+        lesson_chain.handle(self.data)
+        stages = stage_stats.snapshot()
+        self.assertEqual(
+            set(stages),
+            {'ReadFileHandler', 'MetadataHandler', 'MarkdownHandler', 'TaskHandler', 'BuildResultHandler'}
+        )
+        self.assertTrue(all(row['calls'] == 2 for row in stages.values()))
+        markdown_stage = stages['MarkdownHandler']
+        self.assertGreater(markdown_stage['bytes_in'], 0)
+        self.assertGreater(markdown_stage['bytes_out'], markdown_stage['bytes_in'])
+        self.assertEqual((markdown_stage['cache_misses'], markdown_stage['cache_hits']), (1, 1))
+
+    def test_endpoint_is_staff_only(self):
+        self.client.login(email='test@example.com', password='testpass123')
+        self.assertEqual(self.client.get(reverse('pipeline_stats')).json()['status'], 'error')
+
+    def test_endpoint_toggles_at_runtime(self):
+        self.client.login(email='staff@example.com', password='testpass123')
+        response = self.client.post(reverse('pipeline_stats'), {'enabled': '1'})
+        self.assertTrue(response.json()['enabled'])
+        lesson_chain.handle(self.data)
+
+        stats = self.client.get(reverse('pipeline_stats')).json()
+        self.assertEqual(stats['stages']['ReadFileHandler']['calls'], 1)
+
+        response = self.client.post(reverse('pipeline_stats'), {'enabled': '0', 'reset': '1'})
+        self.assertFalse(response.json()['enabled'])
+        self.assertEqual(self.client.get(reverse('pipeline_stats')).json()['stages'], {})
+
+    def test_flag_is_shared_between_processes(self):
+        stage_stats.set_enabled(True)
+        # Новый экземпляр — как статистика в другом воркере.
+        self.assertTrue(StageStats().enabled())
+        stage_stats.set_enabled(False)
+        self.assertFalse(StageStats().enabled())
+        stage_stats.set_enabled(None)
+        with self.settings(LESSON_STAGE_STATS=True):
+            self.assertTrue(StageStats().enabled())
+
+    def tearDown(self):
+        stage_stats.set_enabled(None)
+        stage_stats.reset()
+        shutil.rmtree(self.course_path, ignore_errors=True)
+
+
+class AsyncCoursePageTest(CourseFilesTestCase):
+    """Тесты для асинхронной страницы курса"""
+
+    def setUp(self):
+        super().setUp()
+        self.add_lessons(4)
+        with open(os.path.join(self.course_path, 'tasks', '1_tusk_lesson_2.md'), 'w', encoding='utf-8') as f:
+            f.write('Задача *2*')
+        cached_lesson_chain.clear()
+        cached_lesson_chain.backend.clear()
+
+    def test_matches_sync_pipeline(self):
+        lessons = [f'lesson_{idx}.md' for idx in range(4)]
+        expected = get_all_lessons(self.course, self.course_path, lessons, [])
+        cached_lesson_chain.clear()
+        cached_lesson_chain.backend.clear()
+        shutil.rmtree(os.path.join(self.course_path, 'build'), ignore_errors=True)
+        result = asyncio.run(get_all_lessons_async(
+            self.course, self.course_path, lessons, lessons_map={o.order: o for o in self.course.lessons_set.all()}
+        ))
+        self.assertEqual(result, expected)
+
+    def test_missing_artifact_is_written(self):
+        lessons = [f'lesson_{idx}.md' for idx in range(4)]
+        asyncio.run(get_all_lessons_async(
+            self.course, self.course_path, lessons, lessons_map={o.order: o for o in self.course.lessons_set.all()}
+        ))
+        for name in lessons:
+            self.assertIsNotNone(load_artifact(os.path.join(self.course_path, name), name, self.course_path))
+
+    @override_settings(COURSE_PAGE_MODE='full')
+    def test_full_mode(self):
+        # Первый ответ выставляет CSRF-cookie, от которой тоже зависит ETag.
+        self.client.get(reverse('course_async', args=[self.course.course_id]))
+        response = self.client.get(reverse('course_async', args=[self.course.course_id]))
+        self.assertEqual(response.status_code, 200)
+        for idx in range(4):
+            self.assertContains(response, f'<strong>{idx}</strong>')
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(reverse('course_async', args=[self.course.course_id]), HTTP_IF_NONE_MATCH=etag).status_code,
+            304
+        )
+
+    @override_settings(COURSE_PAGE_MODE='stream')
+    async def test_stream_mode(self):
+        response = await AsyncClient().get(reverse('course_async', args=[self.course.course_id]))
+        self.assertTrue(response.streaming)
+        page = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8')
+        positions = [page.index(f'<strong>{idx}</strong>') for idx in range(4)]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_lazy_mode_and_missing_course(self):
+        response = self.client.get(reverse('course_async', args=[self.course.course_id]))
+        self.assertEqual([lesson['order'] for lesson in response.context['lessons']], [0, 1, 2, 3])
+        self.assertEqual(self.client.get(reverse('course_async', args=[9999])).status_code, 404)
+
+    @override_settings(COURSE_PAGE_MODE='full')
+    async def test_concurrent_requests(self):
+        client = AsyncClient()
+        url = reverse('course_async', args=[self.course.course_id])
+        responses = await asyncio.gather(*(client.get(url) for _ in range(5)))
+        self.assertEqual({response.status_code for response in responses}, {200})
+        for response in responses:
+            self.assertEqual(response.content.count(b'class="lesson"'), 4)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class MediaWatcherTest(TestCase):
+    """Тесты для наблюдателя за MEDIA_ROOT"""
+
+    def setUp(self):
+        self.course_path = os.path.join(settings.MEDIA_ROOT, '7')
+        os.makedirs(os.path.join(self.course_path, 'tasks'), exist_ok=True)
+        for idx in range(2):
+            self.write(f'lesson_{idx}.md', f'Урок {idx}')
+        refresh_course(self.course_path)
+        self.backend = PollingBackend(settings.MEDIA_ROOT, interval=0)
+
+    def write(self, name, text):
+        with open(os.path.join(self.course_path, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_classify(self):
+        root = settings.MEDIA_ROOT
+        self.assertEqual(classify(os.path.join(root, '7', 'lesson_3.md'), root), (7, 'lesson', 'lesson_3.md'))
+        self.assertEqual(classify(os.path.join(root, '7', 'tasks', '1_tusk_lesson_3.md'), root)[1], 'task')
+        self.assertIsNone(classify(os.path.join(root, '7', 'build', 'manifest.json'), root))
+        self.assertIsNone(classify(os.path.join(root, 'avatars', 'a.png'), root))
+
+    def test_edited_lesson_updates_artifact_and_manifest(self):
+        self.write('lesson_1.md', 'Совсем **другой** урок')
+        changed = self.backend.poll()
+        self.assertEqual(changed, {os.path.join(self.course_path, 'lesson_1.md')})
+
+        with mock.patch.object(lesson_chain, 'handle', wraps=lesson_chain.handle) as handle:
+            self.assertEqual(apply_changes(changed), {7: {'lesson_1.md'}})
+        self.assertEqual([c.args[0][1] for c in handle.call_args_list], ['lesson_1.md'])
+        lesson_path = os.path.join(self.course_path, 'lesson_1.md')
+        self.assertIn('<strong>другой</strong>', load_artifact(lesson_path, 'lesson_1.md', self.course_path)['content'])
+        self.assertEqual(read_manifest(self.course_path)['revision'], 2)
+
+    def test_copied_lessons_appear_in_manifest(self):
+        self.write('lesson_2.md', 'Урок 2')
+        self.write('lesson_3.md', 'Урок 3')
+        os.remove(os.path.join(self.course_path, 'lesson_0.md'))
+        apply_changes(self.backend.poll())
+        names = [entry['name'] for entry in read_manifest(self.course_path)['lessons']]
+        self.assertEqual(names, ['lesson_1.md', 'lesson_2.md', 'lesson_3.md'])
+        self.assertEqual(self.backend.poll(), set())
+
+    def test_task_change_updates_only_tasks_entry(self):
+        before = read_manifest(self.course_path)
+        with open(os.path.join(self.course_path, 'tasks', '1_tusk_lesson_0.md'), 'w', encoding='utf-8') as f:
+            f.write('Задача')
+        with mock.patch.object(lesson_chain, 'handle', wraps=lesson_chain.handle) as handle, \
+                mock.patch('education.manifest._lesson_entry') as lesson_entry:
+            self.assertEqual(apply_changes(self.backend.poll()), {7: set()})
+        self.assertEqual([c.args[0][1] for c in handle.call_args_list], ['lesson_0.md'])
+        lesson_entry.assert_not_called()
+
+        after = read_manifest(self.course_path)
+        self.assertEqual(after['lessons'], before['lessons'])
+        self.assertEqual(after['revision'], before['revision'] + 1)
+        self.assertNotEqual(after['hash'], before['hash'])
+
+    def test_editor_save_is_not_processed_again(self):
+        write_lesson(self.course_path, 'lesson_1.md', ['Сохранено **редактором**'.encode('utf-8')])
+        revision = read_manifest(self.course_path)['revision']
+        changed = self.backend.poll()
+        self.assertEqual(changed, {os.path.join(self.course_path, 'lesson_1.md')})
+
+        with mock.patch('education.watcher.compile_lesson') as compile_:
+            self.assertEqual(apply_changes(changed), {})
+        compile_.assert_not_called()
+        self.assertEqual(read_manifest(self.course_path)['revision'], revision)
+
+    def test_rebuilt_on_read_manifest_does_not_hide_change(self):
+        self.write('lesson_1.md', 'Правка в обход редактора')
+        get_manifest(self.course_path)
+        self.assertEqual(apply_changes(self.backend.poll()), {7: {'lesson_1.md'}})
+        lesson_path = os.path.join(self.course_path, 'lesson_1.md')
+        self.assertIn('в обход', load_artifact(lesson_path, 'lesson_1.md', self.course_path)['content'])
+
+    def test_single_watcher_per_media_root(self):
+        lock = acquire_lock(settings.MEDIA_ROOT)
+        self.assertIsNotNone(lock)
+        try:
+            with self.assertRaises(CommandError):
+                call_command('watch_media', '--polling', stdout=StringIO())
+        finally:
+            lock.close()
+
+    def tearDown(self):
+        if os.path.exists(TEST_MEDIA_ROOT):
+            shutil.rmtree(TEST_MEDIA_ROOT)
+
+
+@override_settings(COURSE_PUBLISH_ROOT=TEST_PUBLISH_ROOT)
+class PublishCourseTest(CourseFilesTestCase):
+    """Тесты для статической публикации курсов"""
+
+    def setUp(self):
+        super().setUp()
+        self.add_lessons(2)
+        refresh_course(self.course_path)
+        self.target = course_dir(self.course.course_id)
+
+    def read(self, *parts):
+        with open(os.path.join(self.target, *parts), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_layout_matches_urls(self):
+        page = self.read('index.html')
+        self.assertIn('data-user-authenticated="false"', page)
+        self.assertIn('Lesson 1', page)
+
+        published = json.loads(self.read('lessons', '1', 'index.json'))
+        response = self.client.get(reverse('lesson', args=[self.course.course_id, 1]))
+        self.assertEqual(published, response.json())
+        self.assertIn('<strong>1</strong>', self.read('lessons', '1', 'index.html'))
+
+    def test_republished_on_save(self):
+        self.client.login(email='test@example.com', password='testpass123')
+        self.client.post(
+            reverse('course_edit', args=[self.course.course_id]),
+            {'lesson': '0', 'content': 'Новый **текст**'}
+        )
+        self.assertIn('Новый <strong>текст</strong>', self.read('lessons', '0', 'index.json'))
+
+    def test_lesson_save_rewrites_only_that_lesson(self):
+        other = os.path.join(self.target, 'lessons', '1', 'index.json')
+        inode = os.stat(other).st_ino
+        self.client.login(email='test@example.com', password='testpass123')
+        self.client.post(
+            reverse('course_edit', args=[self.course.course_id]),
+            {'lesson': '0', 'content': 'Новый **текст**'}
+        )
+        self.assertIn('Новый <strong>текст</strong>', self.read('lessons', '0', 'index.json'))
+        self.assertEqual(os.stat(other).st_ino, inode)
+
+    def test_page_has_no_csrf_token(self):
+        self.assertIn('<meta name="csrf-token" content="">', self.read('index.html'))
+
+    def test_queryset_delete_unpublishes(self):
+        Courses.objects.filter(course_id=self.course.course_id).delete()
+        self.assertFalse(os.path.exists(self.target))
+
+    def test_removed_lesson_and_course_are_unpublished(self):
+        os.remove(os.path.join(self.course_path, 'lesson_1.md'))
+        refresh_course(self.course_path)
+        self.assertFalse(os.path.exists(os.path.join(self.target, 'lessons', '1')))
+
+        self.client.login(email='test@example.com', password='testpass123')
+        self.client.post(reverse('delete', args=[self.course.course_id]))
+        self.assertFalse(os.path.exists(self.target))
+
+
+@override_settings(COURSE_PUBLISH_ROOT=TEST_PUBLISH_ROOT, LESSON_COMPRESS_MIN_SIZE=100)
+class PrecompressedLessonTest(CourseFilesTestCase):
+    """Тесты для заранее сжатых вариантов уроков"""
+
+    def setUp(self):
+        super().setUp()
+        self.add_lesson(0, '```python\nprint("hello")\n```\n' * 20)
+        refresh_course(self.course_path)
+        self.url = reverse('lesson', args=[self.course.course_id, 0])
+        self.compressed_dir = os.path.join(self.course_path, 'build', 'compressed')
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=0'), None)
+        self.assertEqual(choose_encoding('identity'), None)
+        self.assertEqual(choose_encoding(''), None)
+
+    def test_gzip_variant_stored_once(self):
+        plain = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        with mock.patch(
+            'education.compression.compress', side_effect=lambda data, encoding: gzip.compress(data, mtime=0)
+        ) as compress:
+            first = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(json.loads(gzip.decompress(first.content)), plain.json())
+        self.assertEqual(len(os.listdir(self.compressed_dir)), 1)
+
+    def test_new_version_replaces_variant(self):
+        self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        with open(os.path.join(self.course_path, 'lesson_0.md'), 'a', encoding='utf-8') as f:
+            f.write('Новый **текст** ' * 20)
+        refresh_course(self.course_path, 'lesson_0.md')
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertIn('Новый <strong>текст</strong>', json.loads(gzip.decompress(response.content))['lesson']['content'])
+        self.assertEqual(len(os.listdir(self.compressed_dir)), 1)
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_differs_per_encoding(self):
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        plain = self.client.get(self.url)
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_published_files_have_gzip_variants(self):
+        lesson_dir = os.path.join(course_dir(self.course.course_id), 'lessons', '0')
+        for name in ('index.json', 'index.html'):
+            with open(os.path.join(lesson_dir, name), 'rb') as f, gzip.open(os.path.join(lesson_dir, f'{name}.gz')) as g:
+                self.assertEqual(f.read(), g.read())
+            self.assertFalse(os.path.exists(os.path.join(lesson_dir, f'{name}.br')))
+
+
+@override_settings(COURSES_PAGE_SIZE=2)
+class CoursesPaginationTest(TestCase):
+    """Тесты для keyset-пагинации списков курсов"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.courses = [Courses.objects.create(title=f'Course {idx}', author=self.user) for idx in range(5)]
+        for course in self.courses:
+            Stars.objects.create(user=self.user, course=course)
+        self.client.login(email='test@example.com', password='testpass123')
+
+    def walk(self, name):
+        ids, after = [], None
+        while True:
+            params = {'format': 'json'} if after is None else {'format': 'json', 'after': after}
+            data = self.client.get(reverse(name), params).json()
+            self.assertLessEqual(len(data['courses']), 2)
+            ids.extend(course['id'] for course in data['courses'])
+            after = data['next']
+            if after is None:
+                return ids
+
+    def test_json_pages_cover_all_courses(self):
+        expected = [course.course_id for course in self.courses]
+        for name in ('all', 'stared', 'my_courses', 'users_courses'):
+            self.assertEqual(self.walk(name), expected)
+
+    def test_html_next_link_keeps_search(self):
+        response = self.client.get(reverse('all'), {'q': 'Course', 'filter_by': 'title'})
+        self.assertEqual(len(response.context['courses']), 2)
+        self.assertEqual(response.context['page']['next'], self.courses[1].course_id)
+        self.assertContains(response, 'q=Course')
+        self.assertContains(response, f'after={self.courses[1].course_id}')
+
+        response = self.client.get(reverse('all'), {'after': self.courses[3].course_id})
+        self.assertEqual([c['id'] for c in response.context['courses']], [self.courses[4].course_id])
+        self.assertIsNone(response.context['page']['next'])
+        self.assertNotContains(response, 'rel="next"')
+
+    def test_limit_is_clamped(self):
+        with self.settings(COURSES_PAGE_SIZE_MAX=3):
+            data = self.client.get(reverse('all'), {'format': 'json', 'limit': 1000}).json()
+        self.assertEqual(len(data['courses']), 3)
+
+    def test_admin_list_query_count(self):
+        self.client.get(reverse('users_courses'))
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('users_courses'), {'limit': 1})
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('users_courses'), {'limit': 5})
+        self.assertEqual(len(response.context['courses']), 5)
+        self.assertEqual(response.context['courses'][0]['author'], 'testuser')
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class CourseSearchTest(TestCase):
+    """Тесты для полнотекстового поиска по курсам"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.python = self.make_course('Python', {'Циклы': 'Цикл `for` перебирает **итерируемые** объекты.'})
+        self.sql = self.make_course('Базы данных', {'Индексы': 'Индекс ускоряет поиск строк <b>таблицы</b>.'})
+
+    def make_course(self, title, lessons):
+        course = Courses.objects.create(title=title, author=self.user)
+        course_path = os.path.join(settings.MEDIA_ROOT, str(course.course_id))
+        os.makedirs(course_path, exist_ok=True)
+        for idx, (lesson_title, text) in enumerate(lessons.items()):
+            Lessons.objects.create(course=course, title=lesson_title, order=idx)
+            with open(os.path.join(course_path, f'lesson_{idx}.md'), 'w', encoding='utf-8') as f:
+                f.write(text)
+        refresh_course(course_path)
+        return course
+
+    def search(self, q):
+        return self.client.get(reverse('all'), {'q': q, 'filter_by': 'content'})
+
+    def test_finds_lesson_text_with_snippet(self):
+        response = self.search('итерируемые')
+        courses = response.context['courses']
+        self.assertEqual([c['id'] for c in courses], [self.python.course_id])
+        self.assertIn('<mark>итерируемые</mark>', courses[0]['snippet'])
+        self.assertContains(response, '<mark>итерируемые</mark>', html=False)
+
+    def test_snippet_is_escaped(self):
+        snippet = search_courses('таблицы')[0]['snippet']
+        self.assertNotIn('<b>', snippet)
+        self.assertIn('<mark>таблицы</mark>', snippet)
+
+    def test_title_ranks_above_body(self):
+        self.make_course('Поиск', {'Введение': 'Про поиск.'})
+        hits = search_courses('поиск')
+        self.assertEqual(len(hits), 2)
+        self.assertEqual(Courses.objects.get(course_id=hits[0]['course_id']).title, 'Поиск')
+
+    def test_index_updated_on_edit_and_delete(self):
+        self.client.login(email='test@example.com', password='testpass123')
+        self.client.post(
+            reverse('course_edit', args=[self.sql.course_id]),
+            {'lesson': '0', 'content': 'Теперь про триграммы'}
+        )
+        self.assertEqual([h['course_id'] for h in search_courses('триграммы')], [self.sql.course_id])
+        self.assertEqual(search_courses('таблицы'), [])
+
+        self.client.post(reverse('delete', args=[self.sql.course_id]))
+        self.assertEqual(search_courses('триграммы'), [])
+
+    def test_lesson_save_reindexes_only_that_lesson(self):
+        self.make_course('Большой курс', {f'Урок {idx}': f'Текст {idx}' for idx in range(5)})
+        course = Courses.objects.get(title='Большой курс')
+        self.client.login(email='test@example.com', password='testpass123')
+        with mock.patch('education.search.render_lesson', wraps=render_lesson) as rendered:
+            self.client.post(
+                reverse('course_edit', args=[course.course_id]),
+                {'lesson': '3', 'content': 'Про рекурсию'}
+            )
+        self.assertEqual([c.args[1] for c in rendered.call_args_list], ['lesson_3.md'])
+        self.assertEqual([h['course_id'] for h in search_courses('рекурсию')], [course.course_id])
+        self.assertEqual([h['course_id'] for h in search_courses('Текст')], [course.course_id])
+
+    def test_bulk_and_cascade_deletes_leave_no_hits(self):
+        Courses.objects.filter(pk=self.python.pk).delete()
+        self.assertEqual(search_courses('итерируемые'), [])
+        self.user.delete()
+        self.assertEqual(search_courses('таблицы'), [])
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM education_coursesearch_fts')
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_content_results_are_paginated(self):
+        for idx in range(3):
+            self.make_course(f'Курс {idx}', {'Урок': 'Общее слово пагинация.'})
+        first = self.client.get(reverse('all'), {'q': 'пагинация', 'filter_by': 'content', 'limit': 2, 'format': 'json'}).json()
+        self.assertEqual(len(first['courses']), 2)
+        self.assertEqual(first['next'], 2)
+        second = self.client.get(
+            reverse('all'), {'q': 'пагинация', 'filter_by': 'content', 'limit': 2, 'after': first['next'], 'format': 'json'}
+        ).json()
+        self.assertEqual(len(second['courses']), 1)
+        self.assertIsNone(second['next'])
+        ids = [c['id'] for c in first['courses'] + second['courses']]
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_fts_syntax_in_query_is_ignored(self):
+        self.assertEqual(search_courses('"'), [])
+        self.assertEqual(len(search_courses('Цикл OR NEAR(')), 0)
+
+    def tearDown(self):
+        if os.path.exists(TEST_MEDIA_ROOT):
+            shutil.rmtree(TEST_MEDIA_ROOT)
+
+
+class CatalogueFilterTest(TestCase):
+    """Тесты для фильтров каталога по названию, автору и тегам"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='Pythonista',
+            password='testpass123'
+        )
+        self.course = Courses.objects.create(title='Основы Python', author=self.user)
+        self.other = Courses.objects.create(title='SQL', author=self.user)
+        for name in ('python-basics', 'python-advanced'):
+            self.course.topics.add(Topic.objects.create(name=name, author=self.user))
+
+    def ids(self, filter_by, text):
+        return [c.course_id for c in filter_courses(Courses.objects.order_by('course_id'), filter_by, text)]
+
+    def test_substring_filters(self):
+        self.assertEqual(self.ids('title', 'python'), [self.course.course_id])
+        self.assertEqual(self.ids('author', 'PYTHON'), [self.course.course_id, self.other.course_id])
+        self.assertEqual(self.ids('tags', 'python'), [self.course.course_id])
+        self.assertEqual(self.ids('tags', 'rust'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'pg_trgm есть только в PostgreSQL')
+    def test_explain_uses_trigram_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for filter_by, index in (
+            ('title', 'education_courses_title_trgm'),
+            ('author', 'authentication_user_username_trgm'),
+            ('tags', 'education_topic_name_trgm'),
+        ):
+            plan = filter_courses(Courses.objects.all(), filter_by, 'pyth').explain()
+            self.assertIn(index, plan)
+
+
+class CourseCountersTest(TestCase):
+    """Тесты для счётчиков звёзд и уроков в Courses"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.course = Courses.objects.create(title='Test Course', author=self.user)
+
+    def counters(self, course=None):
+        course = course or self.course
+        course.refresh_from_db()
+        return course.stars_count, course.lessons_count
+
+    def test_add_star_toggles_counter(self):
+        self.client.login(email='test@example.com', password='testpass123')
+        self.client.post(reverse('add_star', args=[self.course.course_id]))
+        self.assertEqual(self.counters(), (1, 0))
+        self.client.post(reverse('add_star', args=[self.course.course_id]))
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_lessons_counter(self):
+        lessons = [Lessons.objects.create(course=self.course, title=f'Lesson {idx}', order=idx) for idx in range(3)]
+        self.assertEqual(self.counters(), (0, 3))
+        lessons[0].delete()
+        self.assertEqual(self.counters(), (0, 2))
+        response = self.client.get(reverse('all'))
+        self.assertEqual(response.context['courses'][0]['lessons_count'], 2)
+
+    def test_delete_after_drift_keeps_counter_at_zero(self):
+        lesson = Lessons.objects.create(course=self.course, title='Lesson', order=0)
+        star = Stars.objects.create(user=self.user, course=self.course)
+        Courses.objects.filter(pk=self.course.pk).update(stars_count=0, lessons_count=0)
+        lesson.delete()
+        star.delete()
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_popular_courses_use_counter(self):
+        other = Courses.objects.create(title='Popular', author=self.user)
+        Stars.objects.create(user=self.user, course=other)
+        self.assertEqual(get_most_popular_courses(self.user)[0], other)
+
+    def test_reconcile_command(self):
+        Lessons.objects.bulk_create(Lessons(course=self.course, title='Lesson', order=idx) for idx in range(2))
+        Stars.objects.create(user=self.user, course=self.course)
+        Courses.objects.filter(pk=self.course.pk).update(stars_count=5)
+
+        out = StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn('звёзды 5 → 1, уроки 0 → 2', out.getvalue())
+        self.assertEqual(self.counters(), (5, 0))
+
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counters(), (1, 2))
+        self.assertEqual(reconcile_counters(), [])
@@ -2,11 +2,12 @@
 
 from django.urls import path
 from education.views import (
-    AllCoursesView, StaredCoursesView, ViewCourseView,
+    AllCoursesView, StaredCoursesView, ViewCourseView, AsyncViewCourseView, LessonView,
     AddCourseView, CourseEditorView,
     MyCoursesView, DeleteCourseView, AdminCoursesView,
     AddStar, ReportCourseView, LessonProgress, CourseProgressList,
-    CreateTopicView, GetTopicsView, GetTopicView, ReportTopicView
+    CreateTopicView, GetTopicsView, GetTopicView, ReportTopicView,
+    PipelineStatsView
 )
 
 urlpatterns = [
@@ -17,6 +18,8 @@ urlpatterns = [
     path('users/courses', AdminCoursesView.as_view(), name='users_courses'),
 
     path('<int:course_id>/', ViewCourseView.as_view(), name='course'),
+    path('<int:course_id>/async/', AsyncViewCourseView.as_view(), name='course_async'),
+    path('<int:course_id>/lessons/<int:order>/', LessonView.as_view(), name='lesson'),
     path('<int:course_id>/progress/', CourseProgressList.as_view(), name='progress'),
     path('<int:course_id>/<int:lesson_id>/progress/', LessonProgress.as_view(), name='lesson_progress'),
 
@@ -29,4 +32,6 @@ urlpatterns = [
     path('topics/', GetTopicsView.as_view(), name='get_topics'),
     path('topic/', GetTopicView.as_view(), name='get_topic'),
     path('courses/<int:course_id>/report-topic/', ReportTopicView.as_view(), name='report_topic'),
+
+    path('stats/pipeline/', PipelineStatsView.as_view(), name='pipeline_stats'),
 ]
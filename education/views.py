@@ -1,27 +1,52 @@
 """education views"""
 
+import asyncio
+import json
 import os
 import re
 import shutil
 import time
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, OuterRef, Exists
+from django.db.models import OuterRef, Exists
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.shortcuts import render, redirect, get_object_or_404
 from django.forms import formset_factory
 from django.views import View
-from django.http import JsonResponse, QueryDict
+from django.http import Http404, JsonResponse, QueryDict, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
-from code_io.mixins import LoggingMixin
+from code_io.mixins import AsyncLoggingMixin, LoggingMixin
 
+from education.aio import get_all_lessons_async, render_lesson_async
+from education.compiler import BUILD_DIR
+from education.compression import compressed_response
+from education.conditional import (
+    add_course_validators, course_precondition, course_state, progress_etag, topics_etag
+)
+from education.instrumentation import stage_stats
 from education.methods import get_most_popular_courses
-from education.files import get_all_lessons, get_lesson_number
+from education.pagination import courses_json, page_context, page_cursor, page_size, paginate, wants_json
+from education.search import filter_courses, search_courses
+from education.files import (
+    course_page_context, course_page_mode, get_all_lessons, get_course_outline, iter_lessons,
+    lesson_payload, render_lesson, resolve_lessons
+)
+from education.layout import LESSON_RE
+from education.refresh import refresh_course, saving, write_lesson
 from education.models import Courses, Lessons, Stars, ReportCourse, Topic, CourseProgress, ReportTopic
 from education.forms import AddCourseForm, AddLessonForm, TopicChoiceForm
 
+# Место в course.html, куда при потоковой отдаче вставляются уроки.
+STREAM_MARKER = '<!--course-lessons-->'
+
 
 def author_or_staff(user, course):
     """
@@ -41,21 +66,163 @@ class ViewCourseView(LoggingMixin, View):
     @staticmethod
     def get(request, course_id):
         """
-        Отображает страницу курса с перечнем и содержимым уроков.
+        Отображает страницу курса.
+
+        В режиме COURSE_PAGE_MODE = 'lazy' (по умолчанию) отдаётся только
+        оглавление, а уроки подгружаются через LessonView. В режиме 'full'
+        все уроки рендерятся в одну страницу, в режиме 'stream' — та же
+        страница отдаётся потоком, урок за уроком.
+
+        Ответ снабжается ETag; повторный запрос с совпавшим
+        If-None-Match получает 304 без рендеринга уроков.
 
         :param request: HTTP-запрос Django
         :param int course_id: Идентификатор курса
         :return: render в 'course.html' с контекстом уроков или 'error.html'
         """
-        course = get_object_or_404(Courses, course_id=course_id)
+        response = course_precondition(request, course_id)
+        if response is not None:
+            return response
+
+        course, lessons_map = course_state(request, course_id)
+        if course is None:
+            raise Http404('Курс не найден.')
         course_path = os.path.join(settings.MEDIA_ROOT, str(course_id))
         if not os.path.exists(course_path):
             return render(request, 'error.html', {'error': 'Курс не найден.'})
 
-        lessons = sorted(os.listdir(course_path), key=get_lesson_number)
-        content = get_all_lessons(course, course_path, lessons, [])
-        content['course_id'] = course_id
-        return render(request, 'course.html', content)
+        lessons = resolve_lessons(course_path)
+        mode = course_page_mode()
+        if mode == 'stream':
+            response = ViewCourseView.stream(request, course, course_path, lessons, lessons_map)
+        else:
+            if mode == 'full':
+                content = get_all_lessons(course, course_path, lessons, [], lessons_map=lessons_map)['lessons']
+            else:
+                content = get_course_outline(course, lessons, course_path, lessons_map)
+            response = render(request, 'course.html', course_page_context(course, content, mode))
+        return add_course_validators(request, course_id, response)
+
+    @staticmethod
+    def stream(request, course, course_path, lessons, lessons_map=None):
+        """
+        Отдаёт страницу курса потоком.
+
+        Сначала уходят шапка и оглавление, затем уроки по одному по мере
+        рендеринга, затем хвост страницы. В памяти одновременно держится
+        только один урок.
+
+        :return: StreamingHttpResponse
+        """
+        outline = get_course_outline(course, lessons, course_path, lessons_map)
+        page = render_to_string('course.html', course_page_context(course, outline, 'stream'), request)
+        head, tail = page.split(STREAM_MARKER, 1)
+
+        def chunks():
+            yield head
+            for lesson in iter_lessons(course, course_path, lessons, lessons_map):
+                yield render_to_string('lesson_fragment.html', {'lesson': lesson})
+            yield tail
+
+        return StreamingHttpResponse(chunks(), content_type='text/html; charset=utf-8')
+
+
+class AsyncViewCourseView(AsyncLoggingMixin, View):
+    """Просмотр содержимого курса для ASGI: уроки рендерятся, не блокируя цикл событий."""
+
+    @staticmethod
+    async def get(request, course_id):
+        """
+        Асинхронный аналог ViewCourseView.get с теми же режимами страницы и валидаторами.
+
+        :param request: HTTP-запрос Django
+        :param int course_id: Идентификатор курса
+        :return: render в 'course.html' с контекстом уроков или 'error.html'
+        """
+        response = await sync_to_async(course_precondition)(request, course_id)
+        if response is not None:
+            return response
+
+        course, lessons_map = await sync_to_async(course_state)(request, course_id)
+        if course is None:
+            raise Http404('Курс не найден.')
+        course_path = os.path.join(settings.MEDIA_ROOT, str(course_id))
+        if not await asyncio.to_thread(os.path.exists, course_path):
+            return await sync_to_async(render)(request, 'error.html', {'error': 'Курс не найден.'})
+
+        lessons = await asyncio.to_thread(resolve_lessons, course_path)
+        mode = course_page_mode()
+        if mode == 'stream':
+            response = await AsyncViewCourseView.stream(request, course, course_path, lessons, lessons_map)
+        else:
+            if mode == 'full':
+                content = (await get_all_lessons_async(course, course_path, lessons, lessons_map))['lessons']
+            else:
+                content = await asyncio.to_thread(get_course_outline, course, lessons, course_path, lessons_map)
+            response = await sync_to_async(render)(request, 'course.html', course_page_context(course, content, mode))
+        return add_course_validators(request, course_id, response)
+
+    @staticmethod
+    async def stream(request, course, course_path, lessons, lessons_map=None):
+        """
+        Отдаёт страницу курса потоком из асинхронного генератора.
+
+        :return: StreamingHttpResponse
+        """
+        outline = await asyncio.to_thread(get_course_outline, course, lessons, course_path, lessons_map)
+        page = await sync_to_async(render_to_string)(
+            'course.html', course_page_context(course, outline, 'stream'), request
+        )
+        head, tail = page.split(STREAM_MARKER, 1)
+
+        async def chunks():
+            yield head
+            for lesson_name in lessons:
+                m = LESSON_RE.match(lesson_name)
+                obj = lessons_map.get(int(m.group(1))) if m else None
+                lesson = await render_lesson_async(course_path, lesson_name, obj)
+                yield render_to_string('lesson_fragment.html', {'lesson': lesson})
+            yield tail
+
+        return StreamingHttpResponse(chunks(), content_type='text/html; charset=utf-8')
+
+
+class LessonView(LoggingMixin, View):
+    """Содержимое одного урока для страницы курса."""
+
+    @staticmethod
+    def get(request, course_id, order):
+        """
+        Рендерит один урок курса.
+
+        По умолчанию отвечает JSON, с ?format=html — HTML-фрагментом.
+        Ответ сжимается по Accept-Encoding; сжатый вариант строится один
+        раз на версию урока и хранится в build/compressed курса.
+
+        :param request: HTTP-запрос Django
+        :param int course_id: Идентификатор курса
+        :param int order: Порядковый номер урока (N в lesson_N.md)
+        :return: JSON с ключом "lesson" или HTML-фрагмент 'lesson_fragment.html'
+        """
+        course = get_object_or_404(Courses, course_id=course_id)
+        lesson_name = f"lesson_{order}.md"
+        course_path = os.path.join(settings.MEDIA_ROOT, str(course_id))
+        if not os.path.isfile(os.path.join(course_path, lesson_name)):
+            return JsonResponse({'status': 'error', 'error': 'lesson not found'}, status=404)
+
+        obj = Lessons.objects.filter(course=course, order=order).first()
+        lesson = render_lesson(course_path, lesson_name, obj)
+        lesson['order'] = order
+
+        compressed_dir = os.path.join(course_path, BUILD_DIR, 'compressed')
+        if request.GET.get('format') == 'html':
+            html = render_to_string('lesson_fragment.html', {'lesson': lesson})
+            return compressed_response(
+                request, html.encode('utf-8'), 'text/html; charset=utf-8', compressed_dir, f'lesson_{order}.html'
+            )
+
+        data = json.dumps({'status': 'ok', 'lesson': lesson_payload(lesson, order)}, cls=DjangoJSONEncoder)
+        return compressed_response(request, data.encode('utf-8'), 'application/json', compressed_dir, f'lesson_{order}.json')
 
 
 class AllCoursesView(LoggingMixin, View):
@@ -66,43 +233,59 @@ class AllCoursesView(LoggingMixin, View):
         """
         Формирует список всех курсов.
 
-        Отмечает, какие курсы пользователь уже «застарил».
+        Отмечает, какие курсы пользователь уже «застарил». Курсы отдаются
+        страницами (?after=, ?limit=, см. education.pagination), с
+        ?format=json — JSON для бесконечной прокрутки. filter_by=content —
+        полнотекстовый поиск по урокам (education.search): курсы по
+        убыванию ранга с фрагментами текста; курсором страницы здесь служит
+        смещение по рангу.
 
         :param request: HTTP-запрос Django
-        :return: render в 'all_courses.html' с контекстом курсов
+        :return: render в 'all_courses.html' с контекстом курсов или JsonResponse
         """
         q = request.GET.get('q', '').strip()
         filter_by = request.GET.get('filter_by', 'title')
 
-        qs = Courses.objects.annotate(
-            lessons_count=Count('lessons')
-        ).select_related('author').prefetch_related('topics')
+        qs = Courses.objects.select_related('author').prefetch_related('topics')
+        if request.user.is_authenticated:
+            qs = qs.annotate(is_stared=Exists(
+                Stars.objects.filter(course=OuterRef('pk'), user=request.user)
+            ))
 
+        hits = None
         if q:
-            if filter_by == 'title':
-                qs = qs.filter(title__icontains=q)
-            elif filter_by == 'author':
-                qs = qs.filter(author__username__icontains=q)
-            elif filter_by == 'tags':
-                qs = qs.filter(topics__name__icontains=q)
-        qs = qs.distinct()
+            if filter_by == 'content':
+                size = page_size(request)
+                offset = max(page_cursor(request) or 0, 0)
+                found = search_courses(q, size + 1, offset)
+                hits = {hit['course_id']: hit for hit in found[:size]}
+                search_next = offset + size if len(found) > size else None
+                qs = qs.filter(course_id__in=list(hits))
+            else:
+                qs = filter_courses(qs, filter_by, q)
+        if hits is None:
+            page, next_cursor = paginate(qs, request)
+        else:
+            ranks = {course_id: idx for idx, course_id in enumerate(hits)}
+            page, next_cursor = sorted(qs, key=lambda c: ranks[c.course_id]), search_next
 
         courses = []
-        for course in qs:
+        for course in page:
             courses.append({
                 'id': course.course_id,
                 'title': course.title,
                 'author': course.author.username if course.author else '—',
                 'topics': [t.name for t in course.topics.all()] or ['—'],
-                'is_stared': (
-                        request.user.is_authenticated
-                        and Stars.objects.filter(user=request.user, course=course).exists()
-                ),
+                'is_stared': getattr(course, 'is_stared', False),
                 'lessons_count': course.lessons_count,
+                'snippet': hits[course.course_id]['snippet'] if hits else '',
             })
+        if wants_json(request):
+            return courses_json(courses, next_cursor)
 
         context = {
             'courses': courses,
+            'page': page_context(request, next_cursor),
             'search': {
                 'q': q,
                 'filter_by': filter_by,
@@ -119,19 +302,20 @@ class StaredCoursesView(LoggingMixin, View):
         """
         Отображает страницу со списком «застаренных» курсов.
 
+        Курсы отдаются страницами, с ?format=json — JSON.
+
         :param request: HTTP-запрос Django
-        :return: redirect на '/login' если не авторизован, иначе render в 'stared_courses.html'
+        :return: redirect на '/login' если не авторизован, иначе render в 'stared_courses.html' или JsonResponse
         """
         if request.user.is_anonymous:
             return redirect('/login')
 
         stared_ids = Stars.objects.filter(user=request.user).values_list('course_id', flat=True)
-        stared_qs = Courses.objects.filter(course_id__in=stared_ids).annotate(
-            lessons_count=Count('lessons')
-        ).select_related('author').prefetch_related('topics')
+        stared_qs = Courses.objects.filter(course_id__in=stared_ids).select_related('author').prefetch_related('topics')
+        page, next_cursor = paginate(stared_qs, request)
 
         courses = []
-        for course in stared_qs:
+        for course in page:
             topics = [t.name for t in course.topics.all()] or ['Свободная тема']
             courses.append({
                 'id': course.course_id,
@@ -142,12 +326,17 @@ class StaredCoursesView(LoggingMixin, View):
                 'lessons_count': course.lessons_count,
             })
 
-        popular_courses = None
-        if not courses:
-            popular_courses = get_most_popular_courses(request.user)
+        if wants_json(request):
+            return courses_json(courses, next_cursor)
+
+        # Пустая страница после последней ещё не значит, что избранного нет.
+        has_stared = bool(page) or stared_ids.exists()
+        popular_courses = None if has_stared else get_most_popular_courses(request.user)
 
         return render(request, 'stared_courses.html', {
             'courses': courses,
+            'has_stared': has_stared,
+            'page': page_context(request, next_cursor),
             'popular_courses': popular_courses
         })
 
@@ -160,19 +349,23 @@ class MyCoursesView(LoggingMixin, View):
         """
         Отображает список курсов, созданных текущим пользователем.
 
+        Курсы отдаются страницами, с ?format=json — JSON.
+
         :param request: HTTP-запрос Django
-        :return: redirect на 'login' если не авторизован, иначе render в 'my_courses.html'
+        :return: redirect на 'login' если не авторизован, иначе render в 'my_courses.html' или JsonResponse
         """
         if not request.user.is_authenticated:
             return redirect('login')
 
-        courses = Courses.objects.filter(author=request.user)
-        content = {'courses': []}
-        for course in courses:
+        page, next_cursor = paginate(Courses.objects.filter(author=request.user), request)
+        content = {'courses': [], 'page': page_context(request, next_cursor)}
+        for course in page:
             content['courses'].append({
                 'id': course.course_id,
                 'title': course.title,
             })
+        if wants_json(request):
+            return courses_json(content['courses'], next_cursor)
         return render(request, 'my_courses.html', content)
 
 
@@ -184,20 +377,25 @@ class AdminCoursesView(LoggingMixin, View):
         """
         Отображает список всех курсов.
 
+        Курсы отдаются страницами, с ?format=json — JSON.
+
         :param request: HTTP-запрос Django
-        :return: redirect на 'login' если не авторизован, иначе render в 'user_courses.html'
+        :return: redirect на 'login' если не авторизован, иначе render в 'user_courses.html' или JsonResponse
         """
         if not request.user.is_authenticated:
             return redirect('login')
 
-        courses = Courses.objects.filter()
-        content = {'courses': []}
-        for course in courses:
+        page, next_cursor = paginate(Courses.objects.select_related('author'), request)
+        content = {'courses': [], 'page': page_context(request, next_cursor)}
+        for course in page:
             content['courses'].append({
                 'id': course.course_id,
                 'title': course.title,
-                'author': course.author
+                'author': course.author.username,
+                'author_id': course.author_id,
             })
+        if wants_json(request):
+            return courses_json(content['courses'], next_cursor)
         return render(request, 'user_courses.html', content)
 
 
@@ -262,14 +460,12 @@ class AddCourseView(LoggingMixin, View):
             folder = os.path.join(settings.MEDIA_ROOT, str(course.course_id))
             os.makedirs(os.path.join(folder, 'tasks'), exist_ok=True)
 
-            for (lesson_pk, idx), lf in zip(lesson_ids, lesson_formset):
-                uploaded = lf.cleaned_data.get('lesson_file')
-                if uploaded:
-                    filename = f"lesson_{idx}.md"
-                    path = os.path.join(folder, filename)
-                    with open(path, 'wb+') as dst:
-                        for chunk in uploaded.chunks():
-                            dst.write(chunk)
+            with saving(folder):
+                for (lesson_pk, idx), lf in zip(lesson_ids, lesson_formset):
+                    uploaded = lf.cleaned_data.get('lesson_file')
+                    if uploaded:
+                        write_lesson(folder, f"lesson_{idx}.md", uploaded.chunks(), refresh=False)
+                refresh_course(folder)
 
             return redirect('my_courses')
 
@@ -365,6 +561,8 @@ class LessonProgress(LoggingMixin, View):
 
 class CourseProgressList(LoggingMixin, View):
     @method_decorator(login_required)
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(condition(etag_func=progress_etag))
     def get(self, request, course_id):
         progresses = CourseProgress.objects.filter(
             user=request.user,
@@ -456,15 +654,15 @@ class CourseEditorView(LoggingMixin, View):
             return redirect('course_edit', course_id=course_id)
 
         filename = f"lesson_{lesson_order}.md"
-        file_path = os.path.join(settings.MEDIA_ROOT, str(course_id), filename)
+        course_path = os.path.join(settings.MEDIA_ROOT, str(course_id))
+        file_path = os.path.join(course_path, filename)
         if not os.path.isfile(file_path):
             messages.error(request, "Файл урока не найден.")
             return redirect(f"{request.path}?lesson={lesson_order}")
 
         new_content = request.POST.get('content', '')
         try:
-            with open(file_path, 'wb') as fp:
-                fp.write(new_content.encode('utf-8'))
+            write_lesson(course_path, filename, [new_content.encode('utf-8')])
             messages.success(request, f"Урок «{filename}» сохранён.")
         except Exception as e:
             messages.error(request, f"Ошибка при сохранении: {e}")
@@ -660,9 +858,15 @@ class CreateTopicView(LoggingMixin, View):
 class GetTopicsView(LoggingMixin, View):
     @method_decorator(login_required)
     def get(self, request):
-        qs = Topic.objects.order_by('name').values('id', 'name')
+        topics = list(Topic.objects.order_by('name').values('id', 'name'))
+        etag = topics_etag(topics)
 
-        return JsonResponse({'status': 'ok', 'topics': list(qs)})
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse({'status': 'ok', 'topics': topics})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 class GetTopicView(LoggingMixin, View):
@@ -671,3 +875,51 @@ class GetTopicView(LoggingMixin, View):
         topic = Topic.objects.filter(id=topic_id).first()
 
         return JsonResponse({'status': 'ok', 'topic': topic})
+
+
+class PipelineStatsView(LoggingMixin, View):
+    """
+    Статистика этапов рендеринга уроков (только для staff).
+
+    Статистика своя у каждого воркера — GET отдаёт замеры обработавшего
+    запрос процесса (pid в ответе); включение и выключение через POST
+    действует на все воркеры.
+    """
+
+    @method_decorator(login_required)
+    def get(self, request):
+        """
+        Отдаёт накопленные замеры этапов.
+
+        :param request: HTTP-запрос Django
+        :return: JsonResponse {'status':'ok','enabled':bool,'pid':int,'stages':{...}} или {'status':'error',...}
+        """
+        if not request.user.is_staff:
+            return JsonResponse({'status': 'error', 'error': 'you must be staff'})
+
+        return JsonResponse({
+            'status': 'ok',
+            'enabled': stage_stats.enabled(),
+            'pid': os.getpid(),
+            'stages': stage_stats.snapshot(),
+        })
+
+    @method_decorator(login_required)
+    def post(self, request):
+        """
+        Включает/выключает замеры во всех процессах или обнуляет статистику текущего.
+
+        Ожидает в body: enabled ('1', '0' или пусто — вернуться к настройке) и/или reset.
+
+        :param request: HTTP-запрос Django
+        :return: JsonResponse {'status':'ok','enabled':bool} или {'status':'error',...}
+        """
+        if not request.user.is_staff:
+            return JsonResponse({'status': 'error', 'error': 'you must be staff'})
+
+        if 'enabled' in request.POST:
+            value = request.POST['enabled']
+            stage_stats.set_enabled(None if value == '' else value == '1')
+        if 'reset' in request.POST:
+            stage_stats.reset()
+        return JsonResponse({'status': 'ok', 'enabled': stage_stats.enabled()})
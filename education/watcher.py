@@ -0,0 +1,292 @@
+"""Слежение за папками курсов в MEDIA_ROOT.
+
+Курсы могут меняться в обход представлений: админскими скриптами,
+копированием на общий том (``media_volume`` в docker-compose) и т.п.
+Наблюдатель превращает изменения в ``media/<course_id>/`` в точечные
+действия:
+
+* изменённый, добавленный или удалённый урок — перекомпиляция артефакта
+  и обновление записи манифеста, поискового документа и статической копии;
+* изменения в ``tasks/`` — перекомпиляция уроков, к которым относятся
+  изменённые задачи, и обновление в манифесте только отметки задач;
+  записи уроков не пересчитываются.
+
+Кэш рендеринга рабочих процессов наблюдатель не трогает: его память им
+не видна. Ключ кэша включает отпечаток исходника (mtime, размер, задачи
+урока), а артефакты и манифест лежат на общем томе, поэтому рабочий
+процесс сам перерендерит изменённый урок при следующем запросе.
+
+Уроки, сохранённые через представления (education.refresh), уже
+обработаны: наблюдатель ждёт окончания сохранения на замке
+``build/save.lock`` и пропускает уроки с отметкой ``refreshed`` в
+манифесте (education.manifest.refreshed_lessons).
+
+Если установлен ``inotify_simple``, изменения приходят от inotify, иначе
+папки периодически опрашиваются. Запускается отдельным процессом —
+командой ``python manage.py watch_media`` (сервис ``watcher`` в
+docker-compose). Наблюдатель держит замок ``MEDIA_ROOT/.watcher.lock``,
+так что второй экземпляр не запустится.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+from education.chain import TASK_RE
+from education.compiler import BUILD_DIR, compile_lesson
+from education.layout import LESSON_RE
+from education.manifest import refreshed_lessons
+from education.refresh import refresh_course, saving
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+logger = logging.getLogger('app')
+
+
+def classify(path, media_root):
+    """
+    Разбирает путь изменённого файла.
+
+    :return: (course_id, 'lesson' | 'task', имя файла) или None, если путь не относится к курсу
+    :rtype: tuple | None
+    """
+    parts = os.path.relpath(path, media_root).split(os.sep)
+    if not parts[0].isdigit():
+        return None
+    course_id = int(parts[0])
+    if len(parts) == 2 and LESSON_RE.match(parts[1]):
+        return course_id, 'lesson', parts[1]
+    if len(parts) == 3 and parts[1] == 'tasks':
+        return course_id, 'task', parts[2]
+    return None
+
+
+def apply_changes(paths, media_root=None):
+    """
+    Применяет пачку изменений файлов курсов.
+
+    :param paths: Пути изменённых, добавленных или удалённых файлов
+    :param media_root: Корень медиа; по умолчанию MEDIA_ROOT
+    :return: course_id → множество обработанных уроков (пустое, если менялись только задачи);
+             курсы, где всё уже обработано путём записи, не попадают
+    :rtype: dict
+    """
+    media_root = media_root or settings.MEDIA_ROOT
+    courses = {}
+    task_lessons = {}
+    for path in paths:
+        change = classify(path, media_root)
+        if change is None:
+            continue
+        course_id, kind, name = change
+        lessons = courses.setdefault(course_id, set())
+        if kind == 'lesson':
+            lessons.add(name)
+        else:
+            tasks = task_lessons.setdefault(course_id, set())
+            m = TASK_RE.match(name)
+            if m:
+                tasks.add(f'lesson_{m.group(2)}.md')
+
+    applied = {}
+    for course_id, lessons in courses.items():
+        course_path = os.path.join(media_root, str(course_id))
+        if not os.path.isdir(course_path):
+            continue
+        with saving(course_path):
+            # Уроки, сохранённые через представления, уже обработаны.
+            lessons = lessons - refreshed_lessons(course_path)
+            if not lessons and course_id not in task_lessons:
+                continue
+            affected = lessons | task_lessons.get(course_id, set())
+            for lesson_name in sorted(affected):
+                lesson_path = os.path.join(course_path, lesson_name)
+                if not os.path.isfile(lesson_path):
+                    continue
+                try:
+                    compile_lesson(lesson_path, lesson_name, course_path)
+                except Exception as e:
+                    logger.warning(f"Не удалось скомпилировать {lesson_path}: {e}")
+            # Один урок — точечное обновление, иначе пересборка целиком; только задачи —
+            # в манифесте меняется лишь их отметка.
+            refresh_course(
+                course_path,
+                next(iter(affected)) if len(affected) == 1 else None,
+                tasks_only=not lessons,
+            )
+        applied[course_id] = lessons
+        logger.info(f"Курс {course_id} обновлён наблюдателем: {sorted(lessons) or 'задачи'}")
+    return applied
+
+
+class PollingBackend:
+    """Опрос папок курсов: сравнение mtime и размеров файлов между проходами."""
+
+    name = 'polling'
+
+    def __init__(self, media_root, interval=2.0):
+        self.media_root = media_root
+        self.interval = interval
+        self._snapshot = self.scan()
+
+    def scan(self):
+        """Снимок файлов курсов: путь → (mtime_ns, size)."""
+        snapshot = {}
+        if not os.path.isdir(self.media_root):
+            return snapshot
+        for course in os.scandir(self.media_root):
+            if not (course.name.isdigit() and course.is_dir()):
+                continue
+            for folder in (course.path, os.path.join(course.path, 'tasks')):
+                try:
+                    entries = list(os.scandir(folder))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.is_file():
+                        st = entry.stat()
+                        snapshot[entry.path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self):
+        """Пути, изменившиеся с прошлого прохода."""
+        current = self.scan()
+        previous, self._snapshot = self._snapshot, current
+        return {
+            path for path in previous.keys() | current.keys()
+            if previous.get(path) != current.get(path)
+        }
+
+    def wait(self, stop_event):
+        """Ждёт следующей пачки изменений (или остановки)."""
+        while not stop_event.wait(self.interval):
+            changed = self.poll()
+            if changed:
+                return changed
+        return set()
+
+    def close(self):
+        pass
+
+
+class InotifyBackend:
+    """Изменения от inotify (Linux, пакет inotify_simple)."""
+
+    name = 'inotify'
+
+    def __init__(self, media_root, debounce=0.5):
+        flags = inotify_simple.flags
+        self.mask = (
+            flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM
+            | flags.CREATE | flags.DELETE | flags.DELETE_SELF
+        )
+        self.media_root = media_root
+        self.debounce = debounce
+        self._inotify = inotify_simple.INotify()
+        self._dirs = {}
+        self._watch(media_root)
+        for name in os.listdir(media_root):
+            course_path = os.path.join(media_root, name)
+            if name.isdigit() and os.path.isdir(course_path):
+                self._watch_course(course_path)
+
+    def _watch(self, path):
+        try:
+            wd = self._inotify.add_watch(path, self.mask)
+        except OSError:
+            return
+        self._dirs[wd] = path
+
+    def _watch_course(self, course_path):
+        self._watch(course_path)
+        tasks_dir = os.path.join(course_path, 'tasks')
+        if os.path.isdir(tasks_dir):
+            self._watch(tasks_dir)
+
+    def wait(self, stop_event):
+        changed = set()
+        while not stop_event.is_set():
+            events = self._inotify.read(timeout=int(self.debounce * 1000))
+            if not events:
+                if changed:
+                    return changed
+                continue
+            for event in events:
+                parent = self._dirs.get(event.wd)
+                if parent is None or not event.name or event.name == BUILD_DIR:
+                    continue
+                path = os.path.join(parent, event.name)
+                if event.mask & inotify_simple.flags.ISDIR:
+                    if event.mask & (inotify_simple.flags.CREATE | inotify_simple.flags.MOVED_TO):
+                        if parent == self.media_root and event.name.isdigit():
+                            self._watch_course(path)
+                            changed.update(os.path.join(path, name) for name in os.listdir(path))
+                        elif event.name == 'tasks':
+                            self._watch(path)
+                    continue
+                changed.add(path)
+        return changed
+
+    def close(self):
+        self._inotify.close()
+
+
+def get_backend(media_root=None, polling=False, interval=2.0):
+    """inotify, если он доступен и не запрошен опрос, иначе опрос папок."""
+    media_root = media_root or settings.MEDIA_ROOT
+    if inotify_simple is not None and not polling:
+        try:
+            return InotifyBackend(media_root)
+        except OSError as e:
+            logger.warning(f"inotify недоступен, переходим на опрос: {e}")
+    return PollingBackend(media_root, interval)
+
+
+def acquire_lock(media_root):
+    """
+    Захватывает замок наблюдателя (flock на MEDIA_ROOT/.watcher.lock).
+
+    :return: открытый файл замка (держать, пока наблюдатель работает)
+             или None, если наблюдатель уже запущен другим процессом
+    """
+    os.makedirs(media_root, exist_ok=True)
+    lock = open(os.path.join(media_root, '.watcher.lock'), 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def watch(stop_event=None, media_root=None, polling=False, interval=2.0):
+    """
+    Следит за MEDIA_ROOT до установки stop_event.
+
+    :param threading.Event stop_event: Событие остановки; None — бесконечно
+    :raises RuntimeError: если наблюдатель уже запущен другим процессом
+    """
+    stop_event = stop_event or threading.Event()
+    media_root = media_root or settings.MEDIA_ROOT
+    lock = acquire_lock(media_root)
+    if lock is None:
+        raise RuntimeError(f"Наблюдатель за {media_root} уже запущен")
+    backend = get_backend(media_root, polling, interval)
+    logger.info(f"Наблюдатель за {media_root} запущен ({backend.name})")
+    try:
+        while not stop_event.is_set():
+            changed = backend.wait(stop_event)
+            if changed:
+                try:
+                    apply_changes(changed, media_root)
+                except Exception as e:
+                    logger.warning(f"Наблюдатель не смог применить изменения: {e}")
+    finally:
+        backend.close()
+        lock.close()